@@ -3,28 +3,169 @@
 实现Minimax算法和Alpha-Beta剪枝，提供不同难度的AI
 """
 
+import os
 import random
 import math
+import threading
 import time
 from typing import Optional, Tuple, List
 
+from game_logic import (
+    COLS, SQUARES, RIVER_POSITIONS, DEN_POSITIONS, TRAP_POSITIONS, RIVER_JUMPS, DEN_DISTANCE,
+    IS_RIVER_SQUARE, TRAP_OWNER, CODE_PLAYER, CODE_RANK, ZOBRIST_SIDE
+)
+from opening_book import OpeningBook, DEFAULT_BOOK_PATH
+from tablebase import Tablebase, DEFAULT_TABLEBASE_DIR, WIN, LOSS, DRAW
+from transposition import TranspositionTable, EvalCache, EXACT, LOWER, UPPER
+
+# 搜索的最大层数（杀手移动表的大小）
+MAX_PLY = 64
+
+# 每搜索多少个节点检查一次时间和节点预算
+NODE_CHECK_INTERVAL = 256
+
+# 渴望窗口的初始半宽
+ASPIRATION_WINDOW = 50
+
+# 静态搜索（只看吃子和进入兽穴）的最大层数
+QUIESCENCE_DEPTH = 6
+
+# 增量剪枝的余量：吃子后的分数加上这个余量仍不超过alpha时，不再搜索这个吃子
+DELTA_MARGIN = 200
+
+# 评估用的位置表
+# 每个格子到最近的河流格子的曼哈顿距离（河流中为0）
+RIVER_DISTANCE = tuple(
+    min(abs(sq // COLS - row) + abs(sq % COLS - col) for row, col in RIVER_POSITIONS)
+    for sq in range(SQUARES)
+)
+# 开局的中心位置
+CENTER_POSITIONS = frozenset([(4, 3), (4, 2), (4, 4), (3, 3), (5, 3)])
+# 中局的关键位置：中路和河流边缘
+MIDGAME_KEY_POSITIONS = frozenset([
+    (2, 3), (3, 3), (4, 3), (5, 3), (6, 3),
+    (3, 1), (3, 5), (5, 1), (5, 5)
+])
+# 高级战术中的关键路径：红方为第6~8行、蓝方为第0~2行的中间三列
+KEY_PATH_POSITIONS = {
+    'red': frozenset((row, col) for col in (2, 3, 4) for row in range(6, 9)),
+    'blue': frozenset((row, col) for col in (2, 3, 4) for row in range(0, 3)),
+}
+
+# 评估中各项分数的 (下界, 上界)，用于懒惰评估（见 DoushouqiAI._evaluate_position）
+# 都按各项的计算方法推出：
+#   高价值棋子的保护 ±100；移动能力：每方最多32个合法移动，每个2分；跳河：每方最多2个狮虎，每个20分
+#   开局：中心5格各15分、狮虎出动各20分、老鼠靠近河流10分、兽穴保护4个棋子各20分，高价值棋子冒进各-15分
+#   中局：优势兵力+50/-30、关键位置80、狮虎跳河50、老鼠接近大象30、高价值棋子被保护45、陷阱3个各40分
+#   残局：兵力差±500、等级差±320、鼠象±200、狮虎±150、兽穴距离差±260、兽穴旁最多3个棋子各±500、移动能力±160
+#   协调性：相互保护280、威胁差±320、集中度±20
+#   高级战术：每个棋子最多有4个合法目标，每个格子最多被4个棋子攻击
+#     预测性吃子：等级r的棋子最多吃4个等级不超过r的棋子，按等级最高的4个、全在陷阱中（×1.5）计，8种棋子合计3000
+#     威胁链：每个棋子最多威胁4个棋子（60），狮虎象再加威胁到的狮虎象各25，合计525
+#     鼠象50；跳河：2个狮虎，每个格子最多2个跳河目标，合计360；牺牲：3个小棋子×3个大棋子×20=180；时间压力±100
+#     反向思考：等级r的棋子最多被4个等级不低于r的棋子攻击，每个r×15（狮虎象×1.5），合计1800，乘以0.8
+EVAL_TERM_BOUNDS = {
+    'high_value': (-100, 100),
+    'mobility': (-64, 64),
+    'jump': (-40, 40),
+    'opening': (-45, 205),
+    'midgame': (-30, 375),
+    'endgame': (-3090, 3090),
+    'coordination': (-340, 620),
+    'tactics': (-1540, 4215),
+}
+
+# 残局库中胜局面的基准分数：减去到对局结束的层数（包括离根节点的层数），越快取胜分数越高；
+# 低于搜索中直接看到的胜负（±10000）
+TABLEBASE_WIN = 9900
+# 绝对值在 TABLEBASE_BOUND 和 10000 之间的分数来自残局库，与离根节点的层数有关，
+# 存入换位表时换成相对于当前节点的分数，读取时再换回来；
+# 评估分数限制在 ±(TABLEBASE_BOUND - 1) 之内（见 _evaluate_board），不会落进这个范围
+TABLEBASE_BOUND = TABLEBASE_WIN - 1000
+
+# 后台思考（对手思考期间的搜索）的时间上限（秒）：每次最多 PONDER_TIME，每局合计最多 PONDER_TIME_PER_GAME
+PONDER_TIME = 60
+PONDER_TIME_PER_GAME = 600
+
+# 以蓝方为评估视角时异或进换位表键的随机数，同一局面在两种视角下的分数分开保存
+ROOT_PERSPECTIVE_KEY = random.Random(20240602).getrandbits(64)
+
+
+class SearchAborted(Exception):
+    """搜索超出时间或节点预算时抛出，在迭代加深的循环中捕获"""
+
 
 class DoushouqiAI:
     """斗兽棋AI引擎"""
 
-    def __init__(self, difficulty='medium'):
+    def __init__(self, difficulty='medium', tt_size_mb=16, eval_cache_mb=2, workers=1, tt_buffer=None,
+                 book_path=None, tablebase_dir=None):
         """
         初始化AI
 
         Args:
             difficulty: AI难度 ('beginner', 'easy', 'amateur', 'professional', 'master')
+            tt_size_mb: 换位表大小（MB）
+            eval_cache_mb: 评估缓存大小（MB）
+            workers: 搜索使用的进程数，大于1时使用多进程并行搜索（见 parallel_search.py）
+            tt_buffer: 可选，换位表使用的共享内存缓冲区（并行搜索的辅助进程使用）
+            book_path: 开局库文件（专业级和大师级使用），默认为 opening_book.bin，文件不存在或格式不正确时不使用
+            tablebase_dir: 残局库目录（专业级和大师级使用），默认为 tablebases/，没有文件时不使用
         """
         self.difficulty = difficulty
         self.max_depth = self._get_max_depth()
         self.thinking_time = self._get_thinking_time()
+        self.piece_values = self._get_piece_values()
         self.position_table = self._init_position_table()
-        self.transposition_table = {}  # 换位表，缓存搜索结果
+        # 按难度启用的评估项
+        self.use_strategy_terms = difficulty in ['master', 'professional']  # 开局、中局
+        self.use_master_terms = difficulty == 'master'  # 残局、协调性、高级战术
+        self.eval_noise = 0 if difficulty == 'master' else 5  # 评估的随机因素幅度
+        self.eval_table = self._build_eval_table()
+        self.own_table = self._build_own_table()
+        self.lazy_bounds = self._init_lazy_bounds()
+        # 换位表，缓存搜索结果（键见 _get_board_key），同一局棋的多次搜索之间保留
+        # 并行搜索时换位表放在共享内存中，所有进程共用
+        self.parallel = None
+        if workers > 1:
+            from parallel_search import LazySMP
+            self.parallel = LazySMP(difficulty, workers, tt_size_mb)
+            self.transposition_table = self.parallel.transposition_table
+        else:
+            self.transposition_table = TranspositionTable(tt_size_mb, buffer=tt_buffer)
+        # 评估缓存：局面的评估分数只与局面和评估视角有关，跨搜索和跨对局保留
+        self.eval_cache = EvalCache(eval_cache_mb)
+        # 开局库（见 opening_book.py），库中的局面不搜索
+        self.opening_book = None
+        if difficulty in ['professional', 'master']:
+            path = book_path or DEFAULT_BOOK_PATH
+            if os.path.exists(path):
+                try:
+                    self.opening_book = OpeningBook(path)
+                except ValueError:
+                    # 旧版本的开局库（魔数不同）需要重新生成
+                    self.opening_book = None
+        # 残局库（见 tablebase.py），棋子很少的局面直接查出准确结果
+        self.tablebase = None
+        if difficulty in ['professional', 'master']:
+            tablebase = Tablebase(tablebase_dir or DEFAULT_TABLEBASE_DIR)
+            if tablebase.max_pieces:
+                self.tablebase = tablebase
         self.search_count = 0  # 搜索节点计数
+        self.helper_count = 0  # 并行搜索时辅助进程的节点数之和
+        self._deadline = None  # 本次搜索的截止时间，None表示不限
+        self._node_limit = None  # 本次搜索的节点预算，None表示不限
+        self._next_check = NODE_CHECK_INTERVAL  # 下一次检查预算时的节点数
+        self._root_progress = None  # 当前这一层已证明更好的根节点 (分数, 移动)
+        self._stop_event = None  # 并行搜索的辅助进程中主进程搜索结束时、后台思考被取消时设置的事件
+        self.completed_depth = 0  # 最近一次迭代加深搜索完整搜索过的最大深度
+        # 后台思考（见 start_pondering）
+        self.ponder_budget = PONDER_TIME_PER_GAME  # 本局剩余的后台思考时间（秒）
+        self._ponder_thread = None
+        self._ponder_stop = None  # 取消后台思考的事件
+        self._ponder_results = {}  # 对手回应后的局面的换位表键 -> 按正常预算搜索得到的最佳移动
+        self.killer_moves = []  # 每层两个杀手移动（引起剪枝的普通移动）
+        self.history_table = {}  # 历史表：(走棋方, 移动) -> 引起剪枝的累计分数
 
     def _get_max_depth(self):
         """根据难度获取搜索深度"""
@@ -48,6 +189,64 @@ class DoushouqiAI:
         }
         return time_map.get(self.difficulty, 0.8)
 
+    def _get_piece_values(self):
+        """根据难度获取棋子价值表"""
+        if self.difficulty == 'master':
+            return {
+                1: 300,   # 鼠（特殊价值，可以吃象，且能过河）
+                2: 350,   # 猫
+                3: 420,   # 狗
+                4: 500,   # 狼
+                5: 580,   # 豹
+                6: 1000,  # 虎
+                7: 1200,  # 狮
+                8: 1500   # 象
+            }
+        elif self.difficulty == 'professional':
+            return {
+                1: 200,   # 鼠（特殊价值，可以吃象）
+                2: 280,   # 猫
+                3: 380,   # 狗
+                4: 480,   # 狼
+                5: 550,   # 豹
+                6: 900,   # 虎
+                7: 1000,  # 狮
+                8: 1200   # 象
+            }
+        elif self.difficulty == 'amateur':
+            return {
+                1: 150,   # 鼠
+                2: 220,   # 猫
+                3: 330,   # 狗
+                4: 440,   # 狼
+                5: 500,   # 豹
+                6: 800,   # 虎
+                7: 900,   # 狮
+                8: 1000   # 象
+            }
+        elif self.difficulty == 'easy':
+            return {
+                1: 100,   # 鼠
+                2: 180,   # 猫
+                3: 280,   # 狗
+                4: 380,   # 狼
+                5: 450,   # 豹
+                6: 700,   # 虎
+                7: 800,   # 狮
+                8: 900    # 象
+            }
+        else:  # beginner
+            return {
+                1: 80,    # 鼠
+                2: 150,   # 猫
+                3: 250,   # 狗
+                4: 350,   # 狼
+                5: 400,   # 豹
+                6: 600,   # 虎
+                7: 700,   # 狮
+                8: 800    # 象
+            }
+
     def _init_position_table(self):
         """初始化位置价值表，评估棋盘上不同位置的价值"""
         # 基础位置价值，越靠近对方兽穴价值越高
@@ -61,8 +260,7 @@ class DoushouqiAI:
                 red_value = (8 - row) * 10
 
                 # 河流位置的价值调整
-                if (row, col) in [(3, 1), (3, 2), (4, 1), (4, 2), (5, 1), (5, 2),
-                                  (3, 4), (3, 5), (4, 4), (4, 5), (5, 4), (5, 5)]:
+                if IS_RIVER_SQUARE[row * COLS + col]:
                     # 河流对老鼠有价值，对其他棋子价值低
                     blue_value = 5
                     red_value = 5
@@ -74,329 +272,683 @@ class DoushouqiAI:
             position_value.append(row_values)
         return position_value
 
-    def get_best_move(self, game, player) -> Optional[Tuple[int, int, int, int]]:
+    def _build_eval_table(self):
+        """
+        生成增量评估表：eval_table[棋子编码][格子编号] 是评估中只与单个棋子位置有关的部分，
+        即材质价值、位置价值、棋子数量（每个棋子50分）、兽穴控制、陷阱和河流中老鼠的分数之和，
+        大师级还包括协调性中的河流控制
+
+        搜索用的局面副本通过 set_eval_table 使用这张表，走子和撤销时增量维护双方的总分
+        """
+        table = [None]
+        for code in range(1, len(CODE_PLAYER)):
+            owner = CODE_PLAYER[code]
+            rank = CODE_RANK[code]
+            value = self.piece_values[rank]
+            den_distance = DEN_DISTANCE[(owner, rank)]
+            scores = []
+            for sq in range(SQUARES):
+                row, col = divmod(sq, COLS)
+                score = value + self.position_table[row][col][owner] + 50
+                # 兽穴控制：离对方兽穴不超过2步
+                if den_distance[sq] <= 2:
+                    score += (3 - den_distance[sq]) * 30
+                # 在对方陷阱中的棋子价值减半
+                if TRAP_OWNER[sq] is not None and TRAP_OWNER[sq] != owner:
+                    score -= value * 0.5
+                # 老鼠在河流中有优势
+                if rank == 1 and IS_RIVER_SQUARE[sq]:
+                    score += 30
+                # 河流控制：在河流中1个单位，离河流不超过2格0.5个单位，每个单位15分
+                if self.use_master_terms:
+                    if RIVER_DISTANCE[sq] == 0:
+                        score += 15
+                    elif RIVER_DISTANCE[sq] <= 2:
+                        score += 7.5
+                scores.append(score)
+            table.append(tuple(scores))
+        return tuple(table)
+
+    def _build_own_table(self):
+        """
+        生成只计算评估方自己棋子的位置分数表：own_table[棋子编码][格子编号]
+
+        大师级的兽穴防守、陷阱保护、兽穴突破和关键路径控制只给评估方自己的棋子加分，
+        不能像 eval_table 那样两方相减，评估时对己方棋子逐个查表求和
+        """
+        table = [None]
+        for code in range(1, len(CODE_PLAYER)):
+            owner = CODE_PLAYER[code]
+            rank = CODE_RANK[code]
+            den_distance = DEN_DISTANCE[(owner, rank)]
+            my_den = DEN_POSITIONS[owner]
+            scores = []
+            for sq in range(SQUARES):
+                row, col = divmod(sq, COLS)
+                score = 0
+                if self.use_master_terms:
+                    # 兽穴防守：离自己兽穴不超过2格
+                    if abs(row - my_den[0]) + abs(col - my_den[1]) <= 2:
+                        score += 10
+                    # 陷阱保护：离自己的每个陷阱不超过2格
+                    for trap_row, trap_col in TRAP_POSITIONS[owner]:
+                        if abs(row - trap_row) + abs(col - trap_col) <= 2:
+                            score += 10
+                    # 兽穴突破：走到对方兽穴不超过3步，越近奖励越高，高价值棋子奖励更高
+                    if den_distance[sq] <= 3:
+                        score += (4 - den_distance[sq]) * 30
+                        if rank >= 6:
+                            score += (4 - den_distance[sq]) * 20
+                    # 关键路径控制
+                    if (row, col) in KEY_PATH_POSITIONS[owner]:
+                        score += 15
+                scores.append(score)
+            table.append(tuple(scores))
+        return tuple(table)
+
+    def get_best_move(self, game, player, time_limit=None, node_limit=None) -> Optional[Tuple[int, int, int, int]]:
         """
         获取最佳移动
 
         Args:
             game: 游戏实例
             player: 当前玩家 ('red' 或 'blue')
+            time_limit: 本次搜索的时间预算（秒），大师级默认为 thinking_time，其他难度默认不限时
+            node_limit: 本次搜索的节点预算，默认不限
 
         Returns:
             最佳移动 (from_row, from_col, to_row, to_col)
         """
+        # 后台思考的结果只对这一步有效，且只在使用默认预算时使用
+        self.stop_pondering()
+        ponder_results, self._ponder_results = self._ponder_results, {}
+        use_ponder = time_limit is None and node_limit is None
+
         # 获取所有有效移动
         valid_moves = game.get_valid_moves(player)
 
         if not valid_moves:
             return None
 
-        # 清空换位表和计数器
-        self.transposition_table.clear()
-        self.search_count = 0
+        # 开局库中的局面直接走库中的移动
+        book_move = self._probe_book(game, player)
+        if book_move is not None:
+            return book_move
+
+        # 残局库中的胜负局面直接走库中的移动，和棋局面交给搜索在保持和棋的移动中选择
+        tablebase_move = self._probe_tablebase_move(game, player)
+        if tablebase_move is not None:
+            return tablebase_move
 
         # 根据难度选择策略
         if self.difficulty == 'beginner':
             # 入门：85%概率随机移动，15%概率使用算法
             if random.random() < 0.85:
                 return self._get_random_move(valid_moves)
-            else:
-                return self._minimax_with_alpha_beta(game, player, self.max_depth)
         elif self.difficulty == 'easy':
             # 简单：40%概率随机移动，60%概率使用算法
             if random.random() < 0.4:
                 return self._get_random_move(valid_moves)
-            else:
-                return self._minimax_with_alpha_beta(game, player, self.max_depth)
         elif self.difficulty == 'amateur':
             # 业余：15%概率随机移动，85%概率使用算法
             if random.random() < 0.15:
                 return self._get_random_move(valid_moves)
-            else:
-                return self._minimax_with_alpha_beta(game, player, self.max_depth)
         elif self.difficulty == 'professional':
             # 专业：5%概率随机移动，95%概率使用算法
             if random.random() < 0.05:
                 return self._get_random_move(valid_moves)
-            else:
-                return self._minimax_with_alpha_beta(game, player, self.max_depth)
-        else:  # master
-            # 大师：100%使用算法，使用迭代加深搜索
-            return self._iterative_deepening_search(game, player)
+        elif time_limit is None:
+            # 大师：100%使用算法，在思考时间内尽量加深
+            time_limit = self.thinking_time
 
-    def _get_random_move(self, valid_moves):
-        """简单AI：随机选择移动"""
-        return random.choice(valid_moves)
+        # 对手走了后台思考时搜索过的回应：直接使用按正常预算搜索得到的移动
+        if use_ponder:
+            pondered_move = ponder_results.get(self._get_board_key(game, player))
+            if pondered_move is not None and game.is_valid_move(*pondered_move, player):
+                return pondered_move
 
-    def _iterative_deepening_search(self, game, player) -> Optional[Tuple[int, int, int, int]]:
+        return self.search(game, player, self.max_depth, time_limit, node_limit)
+
+    def search(self, game, player, max_depth, time_limit=None, node_limit=None):
         """
-        迭代加深搜索（大师级专用）
-        在时间限制内不断加深搜索深度，找到最佳移动
+        搜索最佳移动（不含随机移动），workers > 1 时辅助进程同时搜索
 
         Args:
-            game: 游戏实例
+            game: 游戏实例，不会被修改
             player: 当前玩家
+            max_depth: 最大搜索深度
+            time_limit: 时间预算（秒），None表示不限
+            node_limit: 主进程的节点预算，None表示不限
 
         Returns:
-            最佳移动
+            最佳移动，没有合法移动时返回None
         """
-        start_time = time.time()
-        best_move = None
-        best_score = -float('inf')
-
-        # 获取有效移动并排序
-        valid_moves = game.get_valid_moves(player)
-        if not valid_moves:
-            return None
+        self.stop_pondering()
+        search_game = self._start_search(game, player)
+        if self.parallel is None:
+            return self._iterative_deepening_search(search_game, player, max_depth, time_limit, node_limit)
 
-        sorted_moves = self._sort_moves(game, valid_moves, player)
+        helpers = self.parallel.start(game, player, max_depth, self.transposition_table.generation)
+        try:
+            return self._iterative_deepening_search(search_game, player, max_depth, time_limit, node_limit)
+        finally:
+            self.helper_count = self.parallel.stop(helpers)
 
-        # 从深度1开始，逐步加深
-        for depth in range(1, self.max_depth + 1):
-            # 检查时间
-            elapsed = time.time() - start_time
-            if elapsed > self.thinking_time * 0.9:  # 留10%时间用于返回
-                break
-
-            # 在当前深度搜索
-            current_best = None
-            current_best_score = -float('inf')
-            alpha = -float('inf')
-            beta = float('inf')
-
-            for move in sorted_moves:
-                temp_game = game.clone()
-                temp_game.make_move(move[0], move[1], move[2], move[3])
+    def _start_search(self, game, player, new_generation=True):
+        """开始一次搜索：重置计数器和移动排序表，返回搜索用的局面副本
 
-                score = self._minimax(temp_game, depth - 1, alpha, beta, False, player)
+        Args:
+            new_generation: 是否增加换位表的搜索代数（后台思考每次只增加一次，见 _ponder）
+        """
+        # 换位表保留上一步的结果，只增加搜索代数；清空移动排序表和计数器
+        if new_generation:
+            self.transposition_table.new_search()
+        self.search_count = 0
+        self.helper_count = 0
+        self.killer_moves = [[None, None] for _ in range(MAX_PLY)]
+        self.history_table.clear()
+
+        # 在局面副本上原地走子/撤销进行搜索，不修改调用者的局面
+        game = game.clone()
+        game.current_player = player
+        game.set_eval_table(self.eval_table)
+        return game
+
+    def _probe_book(self, game, player):
+        """查询开局库：大师级走权重最高的移动，专业级按权重随机选择；不在库中时返回None"""
+        if self.opening_book is None:
+            return None
+        key = game.zobrist_key
+        if game.current_player != player:
+            key ^= ZOBRIST_SIDE
+        # 过滤掉不合法的移动（哈希冲突）
+        moves = [entry for entry in self.opening_book.probe(key) if game.is_valid_move(*entry[0], player)]
+        if not moves:
+            return None
+        if self.difficulty == 'master':
+            return max(moves, key=lambda entry: entry[1])[0]
+        return random.choices(moves, weights=[entry[1] for entry in moves])[0][0]
 
-                if score > current_best_score:
-                    current_best_score = score
-                    current_best = move
+    def _probe_tablebase_move(self, game, player):
+        """查询残局库：胜局面走最快取胜的移动，负局面走拖延最久的移动；和棋或不在库中时返回None"""
+        if self.tablebase is None or game.current_player != player:
+            return None
+        entry = self.tablebase.best_move(game)
+        if entry is None or entry[1] == DRAW:
+            return None
+        return entry[0]
+
+    def _tablebase_score(self, entry, ply):
+        """把残局库的 (结果, 层数) 换成以走棋方为视角的搜索分数"""
+        result, distance = entry
+        if result == WIN:
+            return TABLEBASE_WIN - ply - distance
+        if result == LOSS:
+            return -(TABLEBASE_WIN - ply - distance)
+        return 0
+
+    def start_pondering(self, game, player):
+        """
+        开始后台思考：对手思考时，在后台线程中搜索对手的回应之后自己的最佳移动，结果填入换位表。
+        先按正常的预算搜索预计的回应（上一次搜索在换位表中留下的对手最佳移动），
+        剩下的时间平分给其余回应。对手走了按正常预算搜索完的回应时，get_best_move 直接返回结果
 
-                alpha = max(alpha, score)
+        每次最多思考 PONDER_TIME 秒，每局合计最多 PONDER_TIME_PER_GAME 秒；入门和简单级大多走随机移动，
+        不做后台思考。get_best_move、search、new_game 和 close 会先停止后台思考
 
-                if beta <= alpha:
+        Args:
+            game: 自己走完之后的局面（轮到对手），不会被修改
+            player: 自己（AI）的一方
+        """
+        self.stop_pondering()
+        self._ponder_results = {}
+        time_budget = min(PONDER_TIME, self.ponder_budget)
+        if self.difficulty in ['beginner', 'easy']:
+            return
+        if game.game_over or game.current_player == player or time_budget <= 0:
+            return
+        self._ponder_stop = threading.Event()
+        self._ponder_thread = threading.Thread(
+            target=self._ponder, args=(game.clone(), player, self._ponder_stop, time_budget), daemon=True
+        )
+        self._ponder_thread.start()
+
+    def stop_pondering(self):
+        """取消后台思考并等待线程结束，已经得到的结果保留到下一次 get_best_move"""
+        if self._ponder_thread is None:
+            return
+        self._ponder_stop.set()
+        self._ponder_thread.join()
+        self._ponder_thread = None
+        self._ponder_stop = None
+
+    def _ponder(self, game, player, stop_event, time_budget):
+        """后台思考的线程：依次搜索对手的每个回应，直到用完时间或被取消"""
+        start_time = time.time()
+        self._stop_event = stop_event
+        # 整个后台思考算作一次搜索，只增加一次搜索代数，各个回应的搜索不再增加
+        self.transposition_table.new_search()
+        try:
+            replies = game.get_valid_moves(game.current_player)
+            entry = self.transposition_table.probe(self._get_board_key(game, player))
+            if entry is not None and entry[3] in replies:
+                replies.remove(entry[3])
+                replies.insert(0, entry[3])
+            # get_best_move 中的默认预算：入门到专业级搜索到最大深度，大师级限时
+            normal_limit = None
+            if self.difficulty not in ['beginner', 'easy', 'amateur', 'professional']:
+                normal_limit = self.thinking_time
+            for index, reply in enumerate(replies):
+                remaining = time_budget - (time.time() - start_time)
+                if remaining <= 0:
                     break
+                time_limit = remaining if index == 0 else remaining / (len(replies) - index)
+                if normal_limit is not None:
+                    time_limit = min(time_limit, normal_limit)
+                child = game.clone()
+                child.make_move(*reply)
+                if child.game_over:
+                    continue
+                move = self._iterative_deepening_search(
+                    self._start_search(child, player, new_generation=False), player, self.max_depth, time_limit
+                )
+                if stop_event.is_set():
+                    break
+                # 只记录与 get_best_move 的预算相同的结果，时间不够的搜索只留下换位表中的条目
+                if move is not None and (time_limit == normal_limit or self.completed_depth == self.max_depth):
+                    self._ponder_results[self._get_board_key(child, player)] = move
+        finally:
+            self._stop_event = None
+            self.ponder_budget -= time.time() - start_time
+
+    def new_game(self):
+        """开始新的一局：停止后台思考，清空换位表"""
+        self.stop_pondering()
+        self._ponder_results = {}
+        self.ponder_budget = PONDER_TIME_PER_GAME
+        self.transposition_table.clear()
 
-            # 如果找到必胜移动，直接返回
-            if current_best_score >= 10000:
-                return current_best
-
-            # 更新最佳移动
-            if current_best_score > best_score:
-                best_score = current_best_score
-                best_move = current_best
+    def close(self):
+        """停止后台思考，结束并行搜索的辅助进程，释放共享内存，关闭开局库和残局库"""
+        self.stop_pondering()
+        if self.parallel is not None:
+            self.parallel.close()
+            self.parallel = None
+        if self.opening_book is not None:
+            self.opening_book.close()
+            self.opening_book = None
+        if self.tablebase is not None:
+            self.tablebase.close()
+            self.tablebase = None
 
-        return best_move
+    def _get_random_move(self, valid_moves):
+        """简单AI：随机选择移动"""
+        return random.choice(valid_moves)
 
-    def _minimax_with_alpha_beta(self, game, player, depth) -> Optional[Tuple[int, int, int, int]]:
+    def _iterative_deepening_search(self, game, player, max_depth, time_limit=None,
+                                    node_limit=None, start_depth=1) -> Optional[Tuple[int, int, int, int]]:
         """
-        使用Minimax算法和Alpha-Beta剪枝找到最佳移动
+        迭代加深搜索
+        从深度1逐层加深到 max_depth，浅层的结果（换位表中的最佳移动、杀手移动和历史表）
+        让深层搜索的移动排序更准确，总节点数比直接搜索目标深度更少
+
+        搜索过程中每 NODE_CHECK_INTERVAL 个节点检查一次时间和节点预算，超出时立即中止当前这一层，
+        返回上一层完成时的最佳移动；如果中止的这一层已经证明了另一个移动更好，则返回该移动。
+        中止时搜索用的局面副本停在中途，直接丢弃即可
 
         Args:
-            game: 游戏实例
+            game: 游戏实例（搜索用的副本）
             player: 当前玩家
-            depth: 搜索深度
+            max_depth: 最大搜索深度
+            time_limit: 时间预算（秒），None表示不限
+            node_limit: 节点预算，None表示不限
+            start_depth: 起始深度（并行搜索的辅助进程错开深度）
 
         Returns:
             最佳移动
         """
-        valid_moves = game.get_valid_moves(player)
+        start_time = time.time()
+        best_move = None
+        score = None
+        self.completed_depth = 0
+
+        # 第一层总是完整搜索，保证有可用的移动
+        self._deadline = None
+        self._node_limit = None
+        self._next_check = self.search_count + NODE_CHECK_INTERVAL
+
+        for depth in range(start_depth, max_depth + 1):
+            if depth > start_depth:
+                elapsed = time.time() - start_time
+                # 下一层通常比前面所有层加起来还慢，剩余时间不到一半时不再开始
+                if time_limit is not None and elapsed > time_limit * 0.5:
+                    break
+                if node_limit is not None and self.search_count >= node_limit:
+                    break
+                self._deadline = None if time_limit is None else start_time + time_limit
+                self._node_limit = node_limit
+
+            self._root_progress = None
+            try:
+                score, move = self._aspiration_search(game, player, depth, score)
+            except SearchAborted:
+                if self._root_progress is not None:
+                    best_move = self._root_progress[1]
+                break
+            if move is None:
+                break
+            best_move = move
+            self.completed_depth = depth
 
-        if not valid_moves:
-            return None
+            # 如果找到必胜移动，直接返回
+            if score >= 10000:
+                break
 
-        best_move = None
-        best_score = -float('inf')
-        alpha = -float('inf')
-        beta = float('inf')
+        return best_move
+
+    def _aspiration_search(self, game, player, depth, previous_score):
+        """
+        渴望窗口搜索：以上一层的分数为中心用窄窗口搜索，
+        分数落在窗口外时把该侧的窗口加倍后重新搜索，直到分数落在窗口内
 
-        # 排序移动以优化剪枝（优先考虑吃子和有价值的移动）
-        sorted_moves = self._sort_moves(game, valid_moves, player)
+        Returns:
+            (最佳分数, 最佳移动)
+        """
+        if previous_score is None or abs(previous_score) >= 10000:
+            return self._search_root(game, player, depth)
+
+        window = ASPIRATION_WINDOW
+        alpha = previous_score - window
+        beta = previous_score + window
+        while True:
+            score, move = self._search_root(game, player, depth, alpha, beta)
+            if move is None:
+                return score, move
+            if score <= alpha:
+                window *= 2
+                alpha = score - window if window < 10000 else -float('inf')
+            elif score >= beta:
+                window *= 2
+                beta = score + window if window < 10000 else float('inf')
+            else:
+                return score, move
 
-        for move in sorted_moves:
-            # 模拟移动
-            temp_game = game.clone()
-            temp_game.make_move(move[0], move[1], move[2], move[3])
+    def _search_root(self, game, player, depth, alpha=-float('inf'), beta=float('inf')):
+        """
+        根节点搜索
 
-            # 递归搜索
-            score = self._minimax(temp_game, depth - 1, alpha, beta, False, player)
+        Returns:
+            (最佳分数, 最佳移动)，没有合法移动时移动为None；
+            最佳分数 <= alpha 或 >= beta 时只是一个边界
+        """
+        original_alpha = alpha
+        best_score = -float('inf')
+        best_move = None
+        board_key = self._get_board_key(game, player)
+        entry = self.transposition_table.probe(board_key)
+        hash_move = entry[3] if entry else None
+
+        for move in self._ordered_moves(game, 0, hash_move):
+            game.make_move(move[0], move[1], move[2], move[3])
+            if best_move is None:
+                score = -self._negamax(game, depth - 1, -beta, -alpha, 1, player)
+            else:
+                # 主要变例搜索：先用零窗口验证，更好时再用完整窗口重新搜索
+                score = -self._negamax(game, depth - 1, -alpha - 1, -alpha, 1, player)
+                if alpha < score < beta:
+                    score = -self._negamax(game, depth - 1, -beta, -score, 1, player)
+            game.unmake_move()
 
             if score > best_score:
                 best_score = score
                 best_move = move
-
-            alpha = max(alpha, score)
-
-            # 如果beta <= alpha，剪枝
-            if beta <= alpha:
+            if score > alpha:
+                alpha = score
+                # 记录这一层中已经证明比窗口下界更好的移动，搜索中止时使用
+                self._root_progress = (score, move)
+            if alpha >= beta:
                 break
 
-        return best_move
-
-    def _minimax(self, game, depth, alpha, beta, is_maximizing, player):
+        if best_move is not None:
+            self._store_transposition(board_key, best_score, depth, original_alpha, beta, best_move, 0)
+        return best_score, best_move
+
+    def _check_limits(self):
+        """检查时间和节点预算，超出时抛出 SearchAborted"""
+        self._next_check = self.search_count + NODE_CHECK_INTERVAL
+        if self._node_limit is not None and self.search_count >= self._node_limit:
+            raise SearchAborted()
+        if self._deadline is not None and time.time() >= self._deadline:
+            raise SearchAborted()
+        if self._stop_event is not None and self._stop_event.is_set():
+            raise SearchAborted()
+
+    def _negamax(self, game, depth, alpha, beta, ply, player):
         """
-        Minimax算法的递归实现
+        负极大值搜索（Negamax + Alpha-Beta剪枝 + 主要变例搜索）
 
         Args:
             game: 游戏实例
-            depth: 当前深度
+            depth: 剩余深度
             alpha: Alpha值
             beta: Beta值
-            is_maximizing: 是否是最大化层
-            player: 原始玩家
+            ply: 距离根节点的层数
+            player: 原始玩家（评估函数以该玩家为视角）
 
         Returns:
-            评估分数
+            以当前走棋方为视角的分数
         """
-        # 检查游戏是否结束
+        self.search_count += 1
+        if self.search_count >= self._next_check:
+            self._check_limits()
+
+        # 检查游戏是否结束：对局只会在一方走棋取胜后结束，当前节点的走棋方已经输了
+        # （取胜的移动不切换 current_player，不能用它判断视角）
         if game.game_over:
-            return self._evaluate_terminal_state(game, player)
+            return -10000
 
-        # 达到最大深度，评估当前局面
-        if depth == 0:
-            return self._evaluate_board(game, player)
+        # 棋子足够少时查残局库，得到准确结果
+        tablebase = self.tablebase
+        if tablebase is not None and game.piece_count['red'] + game.piece_count['blue'] <= tablebase.max_pieces:
+            entry = tablebase.probe(game)
+            if entry is not None:
+                return self._tablebase_score(entry, ply)
 
-        # 生成棋盘状态的哈希键（用于换位表）
-        board_key = self._get_board_key(game, player, depth)
+        # 达到最大深度，用静态搜索把吃子走完再评估
+        if depth == 0:
+            return self._quiescence(game, alpha, beta, ply, player, QUIESCENCE_DEPTH)
 
         # 检查换位表
-        if board_key in self.transposition_table:
-            stored_entry = self.transposition_table[board_key]
-            if stored_entry['depth'] >= depth:
+        board_key = self._get_board_key(game, player)
+        stored_entry = self.transposition_table.probe(board_key)
+        hash_move = None
+        if stored_entry is not None:
+            stored_score, stored_depth, stored_flag, hash_move = stored_entry
+            stored_score = self._score_from_table(stored_score, ply)
+            if stored_depth >= depth:
                 # 如果存储的深度>=当前深度，可以直接使用
-                if stored_entry['flag'] == 'exact':
-                    return stored_entry['score']
-                elif stored_entry['flag'] == 'lower' and stored_entry['score'] >= beta:
-                    return stored_entry['score']
-                elif stored_entry['flag'] == 'upper' and stored_entry['score'] <= alpha:
-                    return stored_entry['score']
-
-        self.search_count += 1
-        current_player = game.current_player
-
-        if is_maximizing:
-            max_eval = -float('inf')
-            valid_moves = game.get_valid_moves(current_player)
-
-            if not valid_moves:
-                # 无路可走，当前玩家输
-                return -10000 if current_player == player else 10000
+                if stored_flag == EXACT:
+                    return stored_score
+                elif stored_flag == LOWER and stored_score >= beta:
+                    return stored_score
+                elif stored_flag == UPPER and stored_score <= alpha:
+                    return stored_score
+
+        original_alpha = alpha
+        best_score = -float('inf')
+        best_move = None
 
-            sorted_moves = self._sort_moves(game, valid_moves, current_player)
+        for move in self._ordered_moves(game, ply, hash_move):
+            is_quiet = game.piece_at(move[2], move[3]) is None
+            game.make_move(move[0], move[1], move[2], move[3])
+            if best_move is None:
+                score = -self._negamax(game, depth - 1, -beta, -alpha, ply + 1, player)
+            else:
+                score = -self._negamax(game, depth - 1, -alpha - 1, -alpha, ply + 1, player)
+                if alpha < score < beta:
+                    score = -self._negamax(game, depth - 1, -beta, -score, ply + 1, player)
+            game.unmake_move()
 
-            for move in sorted_moves:
-                temp_game = game.clone()
-                temp_game.make_move(move[0], move[1], move[2], move[3])
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                # 引起剪枝的普通移动记为杀手移动，并增加历史分数
+                if is_quiet:
+                    self._record_cutoff(game.current_player, move, depth, ply)
+                break
 
-                eval_score = self._minimax(temp_game, depth - 1, alpha, beta, False, player)
-                max_eval = max(max_eval, eval_score)
-                alpha = max(alpha, eval_score)
+        if best_move is None:
+            # 无路可走，当前玩家输
+            return -10000
 
-                if beta <= alpha:
-                    break
+        # 存储到换位表
+        self._store_transposition(board_key, best_score, depth, original_alpha, beta, best_move, ply)
 
-            # 存储到换位表
-            self._store_transposition(board_key, max_eval, depth, alpha, beta, 'lower')
+        return best_score
 
-            return max_eval
-        else:
-            min_eval = float('inf')
-            valid_moves = game.get_valid_moves(current_player)
+    def _quiescence(self, game, alpha, beta, ply, player, depth):
+        """
+        静态搜索：只搜索进入对方兽穴和吃子（包括吃掉陷阱中的棋子），直到局面平静再评估，
+        避免在吃子过程中间停下来评估
 
-            if not valid_moves:
-                # 无路可走，当前玩家输
-                return 10000 if current_player == player else -10000
+        走棋方可以不吃子，直接取当前局面的评估分数（站立评估）；
+        吃掉的棋子价值加上 DELTA_MARGIN 仍不能超过alpha的吃子不再搜索（增量剪枝）
 
-            sorted_moves = self._sort_moves(game, valid_moves, current_player)
+        Args:
+            depth: 剩余的静态搜索层数
 
-            for move in sorted_moves:
-                temp_game = game.clone()
-                temp_game.make_move(move[0], move[1], move[2], move[3])
+        Returns:
+            以当前走棋方为视角的分数
+        """
+        self.search_count += 1
+        if self.search_count >= self._next_check:
+            self._check_limits()
 
-                eval_score = self._minimax(temp_game, depth - 1, alpha, beta, True, player)
-                min_eval = min(min_eval, eval_score)
-                beta = min(beta, eval_score)
+        # 上一步进入兽穴或吃掉最后一个棋子，当前节点的走棋方已经输了（见 _negamax）
+        if game.game_over:
+            return -10000
 
-                if beta <= alpha:
+        # 评估函数以原始玩家为视角，窗口也换成该视角
+        if game.current_player == player:
+            stand_pat = self._evaluate_board(game, player, alpha, beta)
+        else:
+            stand_pat = -self._evaluate_board(game, player, -beta, -alpha)
+        if stand_pat >= beta or depth == 0:
+            return stand_pat
+        best_score = stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        side = game.current_player
+        opponent_den = game.den_positions['blue' if side == 'red' else 'red']
+        piece_values = self.piece_values
+        # 生成器先给出进入兽穴的移动，再给出吃子，遇到第一个普通移动就停止
+        for move in game.generate_moves(side):
+            target = game.piece_at(move[2], move[3])
+            if target is None:
+                if move[2:] != opponent_den:
                     break
+            elif stand_pat + piece_values[target.rank] + DELTA_MARGIN <= alpha:
+                continue
 
-            # 存储到换位表
-            self._store_transposition(board_key, min_eval, depth, alpha, beta, 'upper')
+            game.make_move(move[0], move[1], move[2], move[3])
+            score = -self._quiescence(game, -beta, -alpha, ply + 1, player, depth - 1)
+            game.unmake_move()
+
+            if score > best_score:
+                best_score = score
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                break
 
-            return min_eval
+        return best_score
 
-    def _get_board_key(self, game, player, depth):
-        """生成棋盘状态的哈希键"""
-        key_parts = []
-        for row in range(9):
-            for col in range(7):
-                piece = game.board[row][col]
-                if piece:
-                    key_parts.append(f"{row}{col}{piece.player}{piece.rank}")
-                else:
-                    key_parts.append(f"{row}{col}N")
-        key_parts.append(player)
-        key_parts.append(str(depth))
-        return ''.join(key_parts)
-
-    def _store_transposition(self, key, score, depth, alpha, beta, flag):
-        """存储到换位表"""
-        if len(self.transposition_table) > 100000:  # 限制表大小
-            self.transposition_table.clear()
+    def _get_board_key(self, game, player):
+        """生成换位表的键：局面的Zobrist哈希值（已包含走棋方），原始玩家（评估视角）为蓝方时再异或 ROOT_PERSPECTIVE_KEY"""
+        if player == 'blue':
+            return game.zobrist_key ^ ROOT_PERSPECTIVE_KEY
+        return game.zobrist_key
 
+    def _store_transposition(self, key, score, depth, alpha, beta, move, ply):
+        """存储到换位表，score 不在 (alpha, beta) 内时只是一个边界；残局库分数换成相对于当前节点的分数"""
         if score <= alpha:
-            stored_flag = 'upper'
+            stored_flag = UPPER
         elif score >= beta:
-            stored_flag = 'lower'
+            stored_flag = LOWER
         else:
-            stored_flag = 'exact'
-
-        self.transposition_table[key] = {
-            'score': score,
-            'depth': depth,
-            'flag': stored_flag
-        }
+            stored_flag = EXACT
+        if TABLEBASE_BOUND <= score < 10000:
+            score += ply
+        elif -10000 < score <= -TABLEBASE_BOUND:
+            score -= ply
+        self.transposition_table.store(key, score, depth, stored_flag, move)
+
+    @staticmethod
+    def _score_from_table(score, ply):
+        """把换位表中相对于节点的残局库分数换回相对于根节点的分数（见 _store_transposition）"""
+        if TABLEBASE_BOUND <= score < 10000:
+            return score - ply
+        if -10000 < score <= -TABLEBASE_BOUND:
+            return score + ply
+        return score
 
-    def _sort_moves(self, game, moves, player):
+    def _ordered_moves(self, game, ply, hash_move):
         """
-        对移动进行排序，优先考虑有价值的移动
-
-        Args:
-            game: 游戏实例
-            moves: 移动列表
-            player: 玩家
+        按搜索顺序逐个生成移动：换位表中的最佳移动、进入兽穴、吃子（被吃棋子价值高、
+        进攻棋子价值低的优先）、本层的两个杀手移动，最后是按历史分数排序的普通移动
 
-        Returns:
-            排序后的移动列表
+        移动是按需生成的，前面的移动引起剪枝时不会生成后面的普通移动
         """
-        move_scores = []
-
-        for move in moves:
-            from_row, from_col, to_row, to_col = move
-            score = 0
-
-            # 优先考虑吃子
-            target_piece = game.board[to_row][to_col]
-            if target_piece and target_piece.player != player:
-                score += target_piece.rank * 100
-
-            # 优先考虑进入对方兽穴
-            opponent = 'blue' if player == 'red' else 'red'
-            if (to_row, to_col) == game.den_positions[opponent]:
-                score += 1000
-
-            # 优先考虑靠近对方兽穴
-            den_pos = game.den_positions[opponent]
-            distance_to_den = abs(to_row - den_pos[0]) + abs(to_col - den_pos[1])
-            score += (12 - distance_to_den) * 5
-
-            move_scores.append((score, move))
-
-        # 按分数降序排序
-        move_scores.sort(reverse=True, key=lambda x: x[0])
-        return [move for score, move in move_scores]
+        side = game.current_player
+        if hash_move is not None and game.is_valid_move(*hash_move, side):
+            yield hash_move
+
+        opponent_den = game.den_positions['blue' if side == 'red' else 'red']
+        quiet_moves = None
+        staged = game.generate_moves(side)
+        for move in staged:
+            if move == hash_move:
+                continue
+            if game.piece_at(move[2], move[3]) is None and move[2:] != opponent_den:
+                # 进入普通移动阶段，剩下的都是普通移动
+                quiet_moves = [move]
+                quiet_moves.extend(staged)
+                break
+            yield move
+
+        if not quiet_moves:
+            return
+
+        killers = self.killer_moves[ply] if ply < len(self.killer_moves) else ()
+        for killer in killers:
+            if killer is not None and killer != hash_move and killer in quiet_moves:
+                quiet_moves.remove(killer)
+                yield killer
+
+        # 历史分数相同时，优先走离对方兽穴更近的移动
+        history = self.history_table
+        piece_at = game.piece_at
+        quiet_moves.sort(key=lambda move: (
+            history.get((side, move), 0),
+            -DEN_DISTANCE[(side, piece_at(move[0], move[1]).rank)][move[2] * COLS + move[3]]
+        ), reverse=True)
+        for move in quiet_moves:
+            if move != hash_move:
+                yield move
+
+    def _record_cutoff(self, side, move, depth, ply):
+        """记录引起剪枝的普通移动：更新本层的杀手移动和历史表"""
+        if ply < len(self.killer_moves):
+            killers = self.killer_moves[ply]
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+        key = (side, move)
+        self.history_table[key] = self.history_table.get(key, 0) + depth * depth
 
     def _evaluate_terminal_state(self, game, player):
         """评估终局状态"""
@@ -405,166 +957,70 @@ class DoushouqiAI:
         else:
             return -10000  # 失败
 
-    def _evaluate_board(self, game, player):
+    def _evaluate_board(self, game, player, alpha=-float('inf'), beta=float('inf')):
         """
-        评估当前棋盘状态
+        评估当前棋盘状态：先查评估缓存，没有时调用 _evaluate_position，完整评估的结果存入缓存，
+        随机因素在缓存之外加上，每次评估都不同
 
         Args:
             game: 游戏实例
             player: 玩家
+            alpha, beta: 以 player 为视角的窗口，分数明显在窗口外时可以提前返回一个边界
 
         Returns:
-            评估分数
+            评估分数，限制在 ±(TABLEBASE_BOUND - 1) 之内；提前返回时 <= alpha 的分数是上界，>= beta 的分数是下界
         """
-        score = 0
-        opponent = 'blue' if player == 'red' else 'red'
-
-        # 棋子价值表（根据难度调整）
-        if self.difficulty == 'master':
-            piece_values = {
-                1: 300,   # 鼠（特殊价值，可以吃象，且能过河）
-                2: 350,   # 猫
-                3: 420,   # 狗
-                4: 500,   # 狼
-                5: 580,   # 豹
-                6: 1000,  # 虎
-                7: 1200,  # 狮
-                8: 1500   # 象
-            }
-        elif self.difficulty == 'professional':
-            piece_values = {
-                1: 200,   # 鼠（特殊价值，可以吃象）
-                2: 280,   # 猫
-                3: 380,   # 狗
-                4: 480,   # 狼
-                5: 550,   # 豹
-                6: 900,   # 虎
-                7: 1000,  # 狮
-                8: 1200   # 象
-            }
-        elif self.difficulty == 'amateur':
-            piece_values = {
-                1: 150,   # 鼠
-                2: 220,   # 猫
-                3: 330,   # 狗
-                4: 440,   # 狼
-                5: 500,   # 豹
-                6: 800,   # 虎
-                7: 900,   # 狮
-                8: 1000   # 象
-            }
-        elif self.difficulty == 'easy':
-            piece_values = {
-                1: 100,   # 鼠
-                2: 180,   # 猫
-                3: 280,   # 狗
-                4: 380,   # 狼
-                5: 450,   # 豹
-                6: 700,   # 虎
-                7: 800,   # 狮
-                8: 900    # 象
-            }
-        else:  # beginner
-            piece_values = {
-                1: 80,    # 鼠
-                2: 150,   # 猫
-                3: 250,   # 狗
-                4: 350,   # 狼
-                5: 400,   # 豹
-                6: 600,   # 虎
-                7: 700,   # 狮
-                8: 800    # 象
-            }
-
-        # 统计双方棋子
-        my_pieces = []
-        opponent_pieces = []
-
-        for row in range(9):
-            for col in range(7):
-                piece = game.board[row][col]
-                if piece:
-                    if piece.player == player:
-                        my_pieces.append((piece, row, col))
-                    else:
-                        opponent_pieces.append((piece, row, col))
-
-        # 1. 开局库（大师级和专业级）
-        if self.difficulty in ['master', 'professional']:
-            opening_score = self._evaluate_opening(game, player, my_pieces, opponent_pieces)
-            score += opening_score
-
-        # 2. 材质价值
-        for piece, row, col in my_pieces:
-            score += piece_values.get(piece.rank, 0)
-            # 添加位置价值
-            score += self.position_table[row][col][player]
-
-        for piece, row, col in opponent_pieces:
-            score -= piece_values.get(piece.rank, 0)
-            score -= self.position_table[row][col][opponent]
-
-        # 3. 棋子数量优势
-        score += (len(my_pieces) - len(opponent_pieces)) * 50
-
-        # 4. 兽穴控制
-        my_den = game.den_positions[player]
-        opponent_den = game.den_positions[opponent]
-
-        # 检查是否有棋子在对方兽穴附近
-        for piece, row, col in my_pieces:
-            distance_to_opponent_den = abs(row - opponent_den[0]) + abs(col - opponent_den[1])
-            if distance_to_opponent_den <= 2:
-                score += (3 - distance_to_opponent_den) * 30
-
-        for piece, row, col in opponent_pieces:
-            distance_to_my_den = abs(row - my_den[0]) + abs(col - my_den[1])
-            if distance_to_my_den <= 2:
-                score -= (3 - distance_to_my_den) * 30
-
-        # 5. 棋子安全性
-        for piece, row, col in my_pieces:
-            danger_score = self._calculate_piece_danger(game, piece, row, col, player)
-            score -= danger_score
+        key = self._get_board_key(game, player)
+        score = self.eval_cache.get(key)
+        if score is None:
+            # 窗口放宽随机因素的幅度，加上随机因素后仍在窗口外
+            score, exact = self._evaluate_position(game, player, alpha - self.eval_noise, beta + self.eval_noise)
+            if exact:
+                self.eval_cache.put(key, score)
+
+        # 随机因素（避免AI过于僵化）
+        if self.eval_noise:
+            score += random.uniform(-self.eval_noise, self.eval_noise)
+
+        # 残局库分数的范围留给残局库（限制是单调的，边界仍然是边界）
+        return min(max(score, 1 - TABLEBASE_BOUND), TABLEBASE_BOUND - 1)
+
+    def _evaluate_position(self, game, player, alpha=-float('inf'), beta=float('inf')):
+        """
+        计算棋盘状态的评估分数（不含随机因素）
 
-        for piece, row, col in opponent_pieces:
-            danger_score = self._calculate_piece_danger(game, piece, row, col, opponent)
-            score += danger_score
+        先计算便宜的部分（增量评估表中的材质、位置、兽穴距离），再逐步计算昂贵的部分；
+        每一步之后，如果剩下各项的上下界（EVAL_TERM_BOUNDS）加起来也不能让分数回到
+        (alpha, beta) 之内，就不再计算，返回分数的边界
 
-        # 6. 陷阱控制
-        my_traps = game.trap_positions[player]
-        opponent_traps = game.trap_positions[opponent]
+        Args:
+            game: 游戏实例
+            player: 玩家
+            alpha, beta: 以 player 为视角的窗口
 
-        # 检查对方棋子是否在我的陷阱中
-        for piece, row, col in opponent_pieces:
-            if (row, col) in my_traps:
-                score += piece_values.get(piece.rank, 0) * 0.5  # 在陷阱中的棋子价值减半
+        Returns:
+            (分数, 是否完整计算)
+        """
+        opponent = 'blue' if player == 'red' else 'red'
 
-        # 检查我的棋子是否在对方陷阱中
+        # 统计双方棋子
+        my_pieces = game.get_pieces(player)
+        opponent_pieces = game.get_pieces(opponent)
+        remaining = self.lazy_bounds[self._game_phase(len(my_pieces) + len(opponent_pieces))]
+
+        # 1. 材质、位置、棋子数量、兽穴控制、陷阱和河流中的老鼠（增量评估表中的部分），
+        #    以及只计算己方棋子的位置分数
+        score = self._static_totals(game, player) - self._static_totals(game, opponent)
+        own_table = self.own_table
         for piece, row, col in my_pieces:
-            if (row, col) in opponent_traps:
-                score -= piece_values.get(piece.rank, 0) * 0.5
-
-        # 7. 河流控制（老鼠）
-        my_rats = [p for p in my_pieces if p[0].rank == 1]
-        opponent_rats = [p for p in opponent_pieces if p[0].rank == 1]
-
-        river_positions = [
-            (3, 1), (3, 2), (4, 1), (4, 2), (5, 1), (5, 2),
-            (3, 4), (3, 5), (4, 4), (4, 5), (5, 4), (5, 5)
-        ]
-
-        # 我方老鼠在河流中的优势
-        for piece, row, col in my_rats:
-            if (row, col) in river_positions:
-                score += 30  # 老鼠在河流中有优势
-
-        # 对方老鼠在河流中的威胁
-        for piece, row, col in opponent_rats:
-            if (row, col) in river_positions:
-                score -= 30
-
-        # 8. 高价值棋子的保护
+            score += own_table[piece.code][row * COLS + col]
+        low, high = remaining[0]
+        if score + high <= alpha:
+            return score + high, False
+        if score + low >= beta:
+            return score + low, False
+
+        # 2. 高价值棋子的保护
         my_high_value = [p for p in my_pieces if p[0].rank >= 6]
         opponent_high_value = [p for p in opponent_pieces if p[0].rank >= 6]
 
@@ -574,12 +1030,27 @@ class DoushouqiAI:
         elif not my_high_value and opponent_high_value:
             score -= 100
 
-        # 9. 移动能力（可以移动的棋子数量）
-        my_movable_count = len(game.get_valid_moves(player))
-        opponent_movable_count = len(game.get_valid_moves(opponent))
+        # 3. 开局库、4. 中局策略（大师级和专业级）
+        if self.use_strategy_terms:
+            score += self._evaluate_opening(game, player, my_pieces, opponent_pieces)
+            score += self._evaluate_midgame(game, player, my_pieces, opponent_pieces)
+
+        # 5. 残局技巧（大师级）
+        if self.use_master_terms:
+            score += self._evaluate_endgame(game, player, my_pieces, opponent_pieces)
+
+        low, high = remaining[1]
+        if score + high <= alpha:
+            return score + high, False
+        if score + low >= beta:
+            return score + low, False
+
+        # 6. 移动能力（可以移动的棋子数量）
+        my_movable_count = game.mobility(player)
+        opponent_movable_count = game.mobility(opponent)
         score += (my_movable_count - opponent_movable_count) * 2
 
-        # 10. 狮虎的特殊价值（可以跳河）
+        # 7. 狮虎的特殊价值（可以跳河）
         for piece, row, col in my_pieces:
             if piece.rank in [6, 7]:  # 虎、狮
                 # 检查是否能跳河
@@ -591,72 +1062,81 @@ class DoushouqiAI:
                 if self._can_jump_river(game, row, col, opponent):
                     score -= 20
 
-        # 11. 中局策略（大师级和专业级）
-        if self.difficulty in ['master', 'professional']:
-            midgame_score = self._evaluate_midgame(game, player, my_pieces, opponent_pieces)
-            score += midgame_score
-
-        # 12. 残局技巧（大师级）
-        if self.difficulty == 'master':
-            endgame_score = self._evaluate_endgame(game, player, my_pieces, opponent_pieces)
-            score += endgame_score
-
-        # 13. 棋子协调性（大师级）
-        if self.difficulty == 'master':
-            coordination_score = self._evaluate_coordination(game, player, my_pieces, opponent_pieces)
-            score += coordination_score
-
-        # 14. 高级战术评估（大师级专用）
-        if self.difficulty == 'master':
-            advanced_tactics_score = self._evaluate_advanced_tactics(game, player, my_pieces, opponent_pieces)
-            score += advanced_tactics_score
-
-        # 15. 随机因素（避免AI过于僵化）
-        if self.difficulty != 'master':
-            score += random.uniform(-5, 5)
-
-        return score
-
-    def _calculate_piece_danger(self, game, piece, row, col, player):
-        """计算棋子的危险程度"""
-        danger_score = 0
-        opponent = 'blue' if player == 'red' else 'red'
-
-        # 检查是否有对手的棋子可以吃掉这个棋子
-        for other_row in range(9):
-            for other_col in range(7):
-                other_piece = game.board[other_row][other_col]
-                if other_piece and other_piece.player != player:
-                    if game.is_valid_move(other_row, other_col, row, col, other_piece.player):
-                        # 如果对手能吃掉这个棋子
-                        if other_piece.rank >= piece.rank:
-                            # 如果在陷阱中，危险更大
-                            if game.is_in_opponent_trap(row, col, player):
-                                danger_score += piece.rank * 3
-                            else:
-                                danger_score += piece.rank * 1.5
-
-        return danger_score
+        if not self.use_master_terms:
+            return score, True
+
+        low, high = remaining[2]
+        if score + high <= alpha:
+            return score + high, False
+        if score + low >= beta:
+            return score + low, False
+
+        # 8. 棋子协调性、9. 高级战术评估（大师级专用）
+        score += self._evaluate_coordination(game, player, my_pieces, opponent_pieces)
+        score += self._evaluate_advanced_tactics(game, player, my_pieces, opponent_pieces)
+
+        return score, True
+
+    @staticmethod
+    def _game_phase(total_pieces):
+        """按双方棋子总数判断阶段，与 _evaluate_opening / _evaluate_midgame / _evaluate_endgame 的判断相同"""
+        if total_pieces >= 14:
+            return 'opening'
+        if 8 <= total_pieces <= 12:
+            return 'midgame'
+        if total_pieces < 8:
+            return 'endgame'
+        return None
+
+    def _init_lazy_bounds(self):
+        """
+        计算懒惰评估用的边界：lazy_bounds[阶段] 是 _evaluate_position 每一步之后，
+        剩下还没计算的各项加起来的 (下界, 上界)
+        """
+        terms = ['high_value', 'mobility', 'jump']
+        if self.use_strategy_terms:
+            terms += ['opening', 'midgame']
+        if self.use_master_terms:
+            terms += ['endgame', 'coordination', 'tactics']
+        # 每一步之后剩下的项
+        stages = (
+            terms,
+            [term for term in terms if term in ('mobility', 'jump', 'coordination', 'tactics')],
+            [term for term in terms if term in ('coordination', 'tactics')],
+        )
+
+        lazy_bounds = {}
+        for phase in ('opening', 'midgame', 'endgame', None):
+            bounds = []
+            for stage_terms in stages:
+                low = high = 0
+                for term in stage_terms:
+                    # 只在某个阶段计算的项，在其他阶段为0
+                    if term in ('opening', 'midgame', 'endgame') and term != phase:
+                        continue
+                    low += EVAL_TERM_BOUNDS[term][0]
+                    high += EVAL_TERM_BOUNDS[term][1]
+                bounds.append((low, high))
+            lazy_bounds[phase] = tuple(bounds)
+        return lazy_bounds
+
+    def _static_totals(self, game, player):
+        """玩家所有棋子在增量评估表中的分数之和；局面没有使用本AI的评估表时直接累加"""
+        if game.eval_table is self.eval_table:
+            return game.eval_totals[player]
+        table = self.eval_table
+        return sum(table[piece.code][row * COLS + col] for piece, row, col in game.get_pieces(player))
 
     def _can_jump_river(self, game, row, col, player):
         """检查狮虎是否能跳河"""
-        piece = game.board[row][col]
+        piece = game.piece_at(row, col)
         if not piece or piece.rank not in [6, 7]:
             return False
 
-        # 检查四个方向是否可以跳跃
-        directions = [
-            (4, 0),   # 纵向跳跃
-            (-4, 0),
-            (0, 3),   # 横向跳跃
-            (0, -3)
-        ]
-
-        for dr, dc in directions:
-            to_row, to_col = row + dr, col + dc
-            if 0 <= to_row < 9 and 0 <= to_col < 7:
-                if game.is_valid_move(row, col, to_row, to_col, player):
-                    return True
+        # 只需检查跳河表中的目标格子
+        for (to_row, to_col), river_cells in RIVER_JUMPS[row * COLS + col]:
+            if game.is_valid_move(row, col, to_row, to_col, player):
+                return True
 
         return False
 
@@ -672,9 +1152,8 @@ class DoushouqiAI:
 
         # 开局原则：
         # 1. 控制中心
-        center_positions = [(4, 3), (4, 2), (4, 4), (3, 3), (5, 3)]
         for piece, row, col in my_pieces:
-            if (row, col) in center_positions:
+            if (row, col) in CENTER_POSITIONS:
                 score += 15
 
         # 2. 快速出子（特别是狮子和老虎）
@@ -689,14 +1168,8 @@ class DoushouqiAI:
         my_rats = [p for p in my_pieces if p[0].rank == 1]
         for piece, row, col in my_rats:
             # 老鼠应该靠近河流
-            river_positions = [
-                (3, 1), (3, 2), (4, 1), (4, 2), (5, 1), (5, 2),
-                (3, 4), (3, 5), (4, 4), (4, 5), (5, 4), (5, 5)
-            ]
-            for river_pos in river_positions:
-                if abs(row - river_pos[0]) + abs(col - river_pos[1]) <= 2:
-                    score += 10
-                    break
+            if RIVER_DISTANCE[row * COLS + col] <= 2:
+                score += 10
 
         # 4. 避免过早暴露高价值棋子
         my_high_value = [p for p in my_pieces if p[0].rank >= 6]
@@ -738,12 +1211,8 @@ class DoushouqiAI:
             score -= 30  # 需要防守
 
         # 2. 控制关键位置
-        key_positions = [
-            (2, 3), (3, 3), (4, 3), (5, 3), (6, 3),  # 中路
-            (3, 1), (3, 5), (5, 1), (5, 5)           # 河流边缘
-        ]
         for piece, row, col in my_pieces:
-            if (row, col) in key_positions:
+            if (row, col) in MIDGAME_KEY_POSITIONS:
                 score += 10
 
         # 3. 利用狮虎跳河优势
@@ -863,14 +1332,14 @@ class DoushouqiAI:
                 score -= 500  # 对方下一步即可进入兽穴
 
         # 8. 棋子的可移动性
-        my_movable_count = len(game.get_valid_moves(player))
-        opponent_movable_count = len(game.get_valid_moves(opponent))
+        my_movable_count = game.mobility(player)
+        opponent_movable_count = game.mobility(opponent)
         score += (my_movable_count - opponent_movable_count) * 5
 
         return score
 
     def _evaluate_coordination(self, game, player, my_pieces, opponent_pieces):
-        """评估棋子协调性（大师级）"""
+        """评估棋子协调性（大师级），兽穴防守和河流控制已经编入 own_table 和 eval_table"""
         score = 0
         opponent = 'blue' if player == 'red' else 'red'
 
@@ -888,17 +1357,15 @@ class DoushouqiAI:
         my_threats = 0
         opponent_threats = 0
 
-        for piece, row, col in my_pieces:
-            for other_piece, other_row, other_col in opponent_pieces:
-                if game.is_valid_move(row, col, other_row, other_col, player):
-                    if piece.rank >= other_piece.rank:
-                        my_threats += 1
+        for other_piece, other_row, other_col in opponent_pieces:
+            for rank in game.attackers(other_row, other_col, player).values():
+                if rank >= other_piece.rank:
+                    my_threats += 1
 
-        for piece, row, col in opponent_pieces:
-            for other_piece, other_row, other_col in my_pieces:
-                if game.is_valid_move(row, col, other_row, other_col, opponent):
-                    if piece.rank >= other_piece.rank:
-                        opponent_threats += 1
+        for other_piece, other_row, other_col in my_pieces:
+            for rank in game.attackers(other_row, other_col, opponent).values():
+                if rank >= other_piece.rank:
+                    opponent_threats += 1
 
         score += (my_threats - opponent_threats) * 10
 
@@ -918,70 +1385,32 @@ class DoushouqiAI:
             elif spread > 25:
                 score -= 20  # 过于分散
 
-        # 4. 关键位置的协同防守
-        my_den = game.den_positions[player]
-        den_defenders = 0
-        for piece, row, col in my_pieces:
-            if abs(row - my_den[0]) + abs(col - my_den[1]) <= 2:
-                den_defenders += 1
-        score += den_defenders * 10
-
-        # 5. 河流的控制协同
-        river_positions = [
-            (3, 1), (3, 2), (4, 1), (4, 2), (5, 1), (5, 2),
-            (3, 4), (3, 5), (4, 4), (4, 5), (5, 4), (5, 5)
-        ]
-
-        my_river_control = 0
-        opponent_river_control = 0
-
-        for piece, row, col in my_pieces:
-            if (row, col) in river_positions:
-                my_river_control += 1
-            else:
-                # 检查是否能威胁到河流
-                for river_pos in river_positions:
-                    if abs(row - river_pos[0]) + abs(col - river_pos[1]) <= 2:
-                        my_river_control += 0.5
-                        break
-
-        for piece, row, col in opponent_pieces:
-            if (row, col) in river_positions:
-                opponent_river_control += 1
-            else:
-                for river_pos in river_positions:
-                    if abs(row - river_pos[0]) + abs(col - river_pos[1]) <= 2:
-                        opponent_river_control += 0.5
-                        break
-
-        score += (my_river_control - opponent_river_control) * 15
-
         return score
 
     def _evaluate_advanced_tactics(self, game, player, my_pieces, opponent_pieces):
-        """评估高级战术（大师级专用）"""
+        """评估高级战术（大师级专用），陷阱保护、兽穴突破和关键路径控制已经编入 own_table"""
         score = 0
         opponent = 'blue' if player == 'red' else 'red'
 
         # 1. 预测性吃子 - 评估能否在下几步吃掉高价值棋子
-        for piece, row, col in my_pieces:
-            for opp_piece, opp_row, opp_col in opponent_pieces:
-                if piece.rank >= opp_piece.rank:
-                    # 检查能否直接吃掉
-                    if game.is_valid_move(row, col, opp_row, opp_col, player):
-                        # 计算吃掉的价值
-                        capture_value = opp_piece.rank * 20
-                        # 如果对方棋子在陷阱中，价值更高
-                        if (opp_row, opp_col) in game.trap_positions[player]:
-                            capture_value *= 1.5
-                        score += capture_value
+        for opp_piece, opp_row, opp_col in opponent_pieces:
+            # 攻击图中能直接吃掉这个棋子的我方棋子
+            for rank in game.attackers(opp_row, opp_col, player).values():
+                if rank >= opp_piece.rank:
+                    # 计算吃掉的价值
+                    capture_value = opp_piece.rank * 20
+                    # 如果对方棋子在陷阱中，价值更高
+                    if (opp_row, opp_col) in game.trap_positions[player]:
+                        capture_value *= 1.5
+                    score += capture_value
 
         # 2. 威胁链评估 - 检查是否能形成连续威胁
         threat_chain = 0
         for piece, row, col in my_pieces:
             threatened_pieces = []
-            for opp_piece, opp_row, opp_col in opponent_pieces:
-                if piece.rank >= opp_piece.rank and game.is_valid_move(row, col, opp_row, opp_col, player):
+            for to_sq in game.legal_targets(row, col):
+                opp_piece = game.piece_at(to_sq // COLS, to_sq % COLS)
+                if opp_piece and piece.rank >= opp_piece.rank:
                     threatened_pieces.append(opp_piece)
             # 如果一个棋子能威胁多个对方棋子，加分
             if len(threatened_pieces) > 1:
@@ -992,32 +1421,7 @@ class DoushouqiAI:
                     threat_chain += 25
         score += threat_chain
 
-        # 3. 陷阱战术 - 评估能否将对方棋子引入陷阱
-        my_traps = game.trap_positions[player]
-        for trap_pos in my_traps:
-            trap_row, trap_col = trap_pos
-            # 检查是否有棋子能保护这个陷阱
-            protectors = 0
-            for piece, row, col in my_pieces:
-                if abs(row - trap_row) + abs(col - trap_col) <= 2:
-                    protectors += 1
-            if protectors > 0:
-                score += protectors * 10
-
-        # 4. 兽穴突破 - 评估进入对方兽穴的可能性
-        opponent_den = game.den_positions[opponent]
-        den_distance_bonus = 0
-        for piece, row, col in my_pieces:
-            distance = abs(row - opponent_den[0]) + abs(col - opponent_den[1])
-            if distance <= 3:
-                # 越近奖励越高
-                den_distance_bonus += (4 - distance) * 30
-                # 如果是高价值棋子，奖励更高
-                if piece.rank >= 6:
-                    den_distance_bonus += (4 - distance) * 20
-        score += den_distance_bonus
-
-        # 5. 老鼠象相克策略
+        # 3. 老鼠象相克策略
         my_rats = [p for p in my_pieces if p[0].rank == 1]
         opponent_elephants = [p for p in opponent_pieces if p[0].rank == 8]
 
@@ -1030,7 +1434,8 @@ class DoushouqiAI:
                     elif distance <= 5:
                         score += 30
 
-        # 6. 狮虎跳河战术
+        # 4. 狮虎跳河战术
+        opponent_den = game.den_positions[opponent]
         jumping_pieces = []
         for piece, row, col in my_pieces:
             if piece.rank in [6, 7] and self._can_jump_river(game, row, col, player):
@@ -1038,16 +1443,13 @@ class DoushouqiAI:
 
         for piece, row, col in jumping_pieces:
             # 评估跳河后的价值
-            directions = [(4, 0), (-4, 0), (0, 3), (0, -3)]
-            for dr, dc in directions:
-                to_row, to_col = row + dr, col + dc
-                if 0 <= to_row < 9 and 0 <= to_col < 7:
-                    if game.is_valid_move(row, col, to_row, to_col, player):
-                        # 跳河后的位置价值
-                        distance_to_den = abs(to_row - opponent_den[0]) + abs(to_col - opponent_den[1])
-                        score += (12 - distance_to_den) * 15
-
-        # 7. 棋子牺牲评估 - 有时牺牲小棋子换取优势
+            for (to_row, to_col), river_cells in RIVER_JUMPS[row * COLS + col]:
+                if game.is_valid_move(row, col, to_row, to_col, player):
+                    # 跳河后的位置价值
+                    distance_to_den = abs(to_row - opponent_den[0]) + abs(to_col - opponent_den[1])
+                    score += (12 - distance_to_den) * 15
+
+        # 5. 棋子牺牲评估 - 有时牺牲小棋子换取优势
         sacrifice_value = 0
         for piece, row, col in my_pieces:
             if piece.rank <= 3:  # 小棋子
@@ -1059,40 +1461,20 @@ class DoushouqiAI:
                             sacrifice_value += 20
         score += sacrifice_value
 
-        # 8. 反向思考 - 评估对手的最佳移动并阻止
+        # 6. 反向思考 - 评估对手的最佳移动并阻止
         opponent_best_threat = 0
-        for opp_piece, opp_row, opp_col in opponent_pieces:
-            for my_piece, my_row, my_col in my_pieces:
-                if opp_piece.rank >= my_piece.rank:
-                    if game.is_valid_move(opp_row, opp_col, my_row, my_col, opponent):
-                        # 对手能吃掉我的棋子，这是威胁
-                        threat_value = my_piece.rank * 15
-                        # 如果我的高价值棋子受威胁，威胁更大
-                        if my_piece.rank >= 6:
-                            threat_value *= 1.5
-                        opponent_best_threat += threat_value
+        for my_piece, my_row, my_col in my_pieces:
+            for opp_rank in game.attackers(my_row, my_col, opponent).values():
+                if opp_rank >= my_piece.rank:
+                    # 对手能吃掉我的棋子，这是威胁
+                    threat_value = my_piece.rank * 15
+                    # 如果我的高价值棋子受威胁，威胁更大
+                    if my_piece.rank >= 6:
+                        threat_value *= 1.5
+                    opponent_best_threat += threat_value
         score -= opponent_best_threat * 0.8  # 扣分表示需要防守
 
-        # 9. 关键路径控制 - 控制通往兽穴的关键路径
-        key_paths = []
-        if player == 'red':
-            # 红方向下进攻
-            for col in [2, 3, 4]:  # 中间三列
-                for row in range(6, 9):
-                    key_paths.append((row, col))
-        else:
-            # 蓝方向上进攻
-            for col in [2, 3, 4]:
-                for row in range(0, 3):
-                    key_paths.append((row, col))
-
-        path_control = 0
-        for piece, row, col in my_pieces:
-            if (row, col) in key_paths:
-                path_control += 15
-        score += path_control
-
-        # 10. 时间压力 - 评估是否需要快速进攻或防守
+        # 7. 时间压力 - 评估是否需要快速进攻或防守
         my_piece_count = len(my_pieces)
         opponent_piece_count = len(opponent_pieces)
 
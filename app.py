@@ -1,6 +1,7 @@
 from flask import Flask, render_template, jsonify, request
 from game_logic import DoushouqiGame
 from ai_engine import DoushouqiAI
+import os
 import random
 
 app = Flask(__name__)
@@ -18,7 +19,8 @@ ai_instances = {
     'easy': DoushouqiAI(difficulty='easy'),
     'amateur': DoushouqiAI(difficulty='amateur'),
     'professional': DoushouqiAI(difficulty='professional'),
-    'master': DoushouqiAI(difficulty='master')
+    # 大师级可以用环境变量 AI_WORKERS 指定并行搜索的进程数
+    'master': DoushouqiAI(difficulty='master', workers=int(os.environ.get('AI_WORKERS', '1')))
 }
 
 @app.route('/')
@@ -30,6 +32,8 @@ def init_game():
     """初始化游戏"""
     global game
     game = DoushouqiGame()
+    for ai in ai_instances.values():
+        ai.new_game()
     return jsonify({
         'board': game.get_board_state(),
         'currentPlayer': game.current_player,
@@ -52,6 +56,8 @@ def new_game():
     current_difficulty = difficulty
 
     game = DoushouqiGame()
+    for ai in ai_instances.values():
+        ai.new_game()
     return jsonify({
         'board': game.get_board_state(),
         'currentPlayer': game.current_player,
@@ -70,15 +76,14 @@ def get_valid_moves():
     player = data['player']
 
     moves = []
-    for to_row in range(9):
-        for to_col in range(7):
-            if game.is_valid_move(from_row, from_col, to_row, to_col, player):
-                moves.append({
-                    'fromRow': from_row,
-                    'fromCol': from_col,
-                    'toRow': to_row,
-                    'toCol': to_col
-                })
+    for move in game.get_valid_moves(player):
+        if move[0] == from_row and move[1] == from_col:
+            moves.append({
+                'fromRow': from_row,
+                'fromCol': from_col,
+                'toRow': move[2],
+                'toCol': move[3]
+            })
 
     return jsonify({'moves': moves})
 
@@ -97,8 +102,7 @@ def make_move():
     # 检查是否无路可走
     if not game.game_over:
         opponent = 'blue' if game.current_player == 'red' else 'red'
-        opponent_moves = game.get_valid_moves(opponent)
-        if not opponent_moves:
+        if not game.has_any_legal_move(opponent):
             # 无路可走，当前玩家获胜
             game.game_over = True
             game.winner = game.current_player
@@ -111,6 +115,9 @@ def make_move():
             ai_move = ai.get_best_move(game, 'blue')
             if ai_move:
                 game.make_move(ai_move[0], ai_move[1], ai_move[2], ai_move[3])
+                # 玩家思考时AI在后台搜索玩家可能的回应，玩家走了预计的一步时可以立即回应
+                if not game.game_over:
+                    ai.start_pondering(game, 'blue')
 
     return jsonify({
         'board': game.get_board_state(),
@@ -155,8 +162,7 @@ def ai_move():
     # 检查是否无路可走
     if not game.game_over:
         opponent = 'blue' if game.current_player == 'red' else 'red'
-        opponent_moves = game.get_valid_moves(opponent)
-        if not opponent_moves:
+        if not game.has_any_legal_move(opponent):
             # 无路可走，当前玩家获胜
             game.game_over = True
             game.winner = game.current_player
@@ -227,30 +233,21 @@ def evaluate_move(move, player):
         score += ((8 - to_row) * 3)
 
     # 6. 如果移动能让自己棋子更安全，加分
-    for row in range(9):
-        for col in range(7):
-            p = temp_game.board[row][col]
-            if p and p.player == player:
-                # 检查这个棋子是否危险
-                for other_row in range(9):
-                    for other_col in range(7):
-                        other = temp_game.board[other_row][other_col]
-                        if other and other.player != player:
-                            if temp_game.is_valid_move(other_row, other_col, row, col, other.player):
-                                if other.rank > p.rank:
-                                    score -= p.rank * 2
+    for p, row, col in temp_game.get_pieces(player):
+        # 检查这个棋子是否危险
+        for other, other_row, other_col in temp_game.get_pieces(opponent):
+            if temp_game.is_valid_move(other_row, other_col, row, col, other.player):
+                if other.rank > p.rank:
+                    score -= p.rank * 2
 
     # 7. 保护重要棋子（象、狮、虎）
     if piece and piece.rank >= 6:
         # 检查移动后是否安全
         danger_count = 0
-        for other_row in range(9):
-            for other_col in range(7):
-                other = temp_game.board[other_row][other_col]
-                if other and other.player != player:
-                    if temp_game.is_valid_move(other_row, other_col, to_row, to_col, other.player):
-                        if other.rank >= piece.rank:
-                            danger_count += 1
+        for other, other_row, other_col in temp_game.get_pieces(opponent):
+            if temp_game.is_valid_move(other_row, other_col, to_row, to_col, other.player):
+                if other.rank >= piece.rank:
+                    danger_count += 1
         if danger_count == 0:
             score += piece.rank * 5
         else:
@@ -267,23 +264,17 @@ def evaluate_move(move, player):
     if original_piece:
         # 检查原位置是否危险
         danger_before = 0
-        for other_row in range(9):
-            for other_col in range(7):
-                other = game.board[other_row][other_col]
-                if other and other.player != player:
-                    if game.is_valid_move(other_row, other_col, from_row, from_col, other.player):
-                        if other.rank >= original_piece.rank:
-                            danger_before += 1
+        for other, other_row, other_col in game.get_pieces(opponent):
+            if game.is_valid_move(other_row, other_col, from_row, from_col, other.player):
+                if other.rank >= original_piece.rank:
+                    danger_before += 1
 
         # 检查新位置是否危险
         danger_after = 0
-        for other_row in range(9):
-            for other_col in range(7):
-                other = game.board[other_row][other_col]
-                if other and other.player != player:
-                    if temp_game.is_valid_move(other_row, other_col, to_row, to_col, other.player):
-                        if other.rank >= original_piece.rank:
-                            danger_after += 1
+        for other, other_row, other_col in game.get_pieces(opponent):
+            if temp_game.is_valid_move(other_row, other_col, to_row, to_col, other.player):
+                if other.rank >= original_piece.rank:
+                    danger_after += 1
 
         if danger_before > danger_after:
             score += (danger_before - danger_after) * original_piece.rank * 2
@@ -0,0 +1,448 @@
+"""
+斗兽棋位棋盘（bitboard）实现
+每个(玩家, 等级)用一个63位整数掩码记录棋子位置，格子编号为 行 * 7 + 列
+对外接口与 DoushouqiGame 保持一致，perft.py 用它对比走法生成的结果
+"""
+
+from game_logic import (
+    INITIAL_PIECES, PIECES as SHARED_PIECES, piece_code,
+    ROWS, COLS, SQUARES, RIVER_POSITIONS, DEN_POSITIONS, TRAP_POSITIONS, MOVE_TABLE, RIVER_JUMPS,
+    ZOBRIST_PIECES, ZOBRIST_SIDE, IS_RIVER_SQUARE,
+    CAPTURE_TABLE, capture_index, TRAP_NONE, TRAP_ATTACKER, AttackMaps
+)
+
+PLAYERS = ('red', 'blue')
+
+
+def _square(row, col):
+    return row * COLS + col
+
+
+def _mask_of(positions):
+    mask = 0
+    for row, col in positions:
+        mask |= 1 << _square(row, col)
+    return mask
+
+
+# 河流、陷阱、兽穴掩码，由 game_logic 中的位置生成
+RIVER_MASK = _mask_of(RIVER_POSITIONS)
+TRAP_MASKS = {player: _mask_of(TRAP_POSITIONS[player]) for player in PLAYERS}
+DEN_MASKS = {player: _mask_of([DEN_POSITIONS[player]]) for player in PLAYERS}
+
+# 由 game_logic 的移动表得到：每个格子的候选目标格子（按编号升序），以及跳河经过的河流掩码
+CANDIDATE_TARGETS = [
+    tuple(_square(to_row, to_col) for to_row, to_col, _ in MOVE_TABLE[sq])
+    for sq in range(SQUARES)
+]
+JUMP_LANES = [
+    {_square(to_row, to_col): _mask_of(river_cells) for (to_row, to_col), river_cells in RIVER_JUMPS[sq]}
+    for sq in range(SQUARES)
+]
+
+# 共享的棋子实例（位棋盘不保存棋子对象，查询时返回 game_logic 中的共享实例）
+PIECES = {
+    (player, rank): SHARED_PIECES[piece_code(player, rank)]
+    for player in PLAYERS for rank in range(1, 9)
+}
+
+
+class BitboardGame:
+    """位棋盘表示的斗兽棋局面"""
+
+    river_positions = RIVER_POSITIONS
+    den_positions = DEN_POSITIONS
+    trap_positions = TRAP_POSITIONS
+
+    def __init__(self):
+        # masks[player][rank]：该玩家该等级棋子的位置掩码（下标0不使用）
+        self.masks = {'red': [0] * 9, 'blue': [0] * 9}
+        self.occupied = {'red': 0, 'blue': 0}
+        self._pieces_cache = {}
+        self._undo_stack = []
+        self._attacks = AttackMaps()
+        self.eval_table = None  # 增量评估表，见 set_eval_table
+        self.current_player = 'red'
+        self.game_over = False
+        self.winner = None
+        for name, rank, player, (row, col) in INITIAL_PIECES:
+            self._put(_square(row, col), player, rank)
+        self.resync()
+
+    @classmethod
+    def from_game(cls, game):
+        """从 DoushouqiGame（或任何提供 piece_at 的局面）构造位棋盘"""
+        if isinstance(game, BitboardGame):
+            return game.clone()
+        new_game = cls.__new__(cls)
+        new_game.masks = {'red': [0] * 9, 'blue': [0] * 9}
+        new_game.occupied = {'red': 0, 'blue': 0}
+        new_game._pieces_cache = {}
+        new_game._undo_stack = []
+        new_game._attacks = AttackMaps()
+        new_game.eval_table = None
+        for row in range(ROWS):
+            for col in range(COLS):
+                piece = game.piece_at(row, col)
+                if piece:
+                    new_game._put(_square(row, col), piece.player, piece.rank)
+        new_game.current_player = game.current_player
+        new_game.game_over = game.game_over
+        new_game.winner = game.winner
+        new_game.resync()
+        return new_game
+
+    def _put(self, sq, player, rank):
+        bit = 1 << sq
+        self.masks[player][rank] |= bit
+        self.occupied[player] |= bit
+
+    @property
+    def zobrist_key(self):
+        """局面的64位Zobrist哈希值，与 DoushouqiGame.zobrist_key 相同"""
+        if self.current_player == 'blue':
+            return self._piece_key ^ ZOBRIST_SIDE
+        return self._piece_key
+
+    def resync(self):
+        """根据掩码重新计算棋子部分的哈希值、棋子数量和攻击图，与 DoushouqiGame.resync 相同"""
+        self.piece_count = {player: bin(self.occupied[player]).count('1') for player in PLAYERS}
+        self._pieces_cache = {}
+        self._attacks.mark_all()
+        key = 0
+        for player in PLAYERS:
+            masks = self.masks[player]
+            for rank in range(1, 9):
+                keys = ZOBRIST_PIECES[(player, rank)]
+                mask = masks[rank]
+                while mask:
+                    low = mask & -mask
+                    key ^= keys[low.bit_length() - 1]
+                    mask ^= low
+        self._piece_key = key
+        self._sum_eval_totals()
+
+    def set_eval_table(self, table):
+        """与 DoushouqiGame.set_eval_table 相同"""
+        self.eval_table = table
+        self._sum_eval_totals()
+
+    def _sum_eval_totals(self):
+        """重新计算 eval_totals，同时按 (玩家, 等级) 准备好评估表的行，走子时直接取用"""
+        totals = {'red': 0, 'blue': 0}
+        table = self.eval_table
+        if table is None:
+            self._eval_rows = None
+        else:
+            self._eval_rows = {
+                player: [None] + [table[piece_code(player, rank)] for rank in range(1, 9)]
+                for player in PLAYERS
+            }
+            for player in PLAYERS:
+                rows = self._eval_rows[player]
+                masks = self.masks[player]
+                for rank in range(1, 9):
+                    mask = masks[rank]
+                    while mask:
+                        low = mask & -mask
+                        totals[player] += rows[rank][low.bit_length() - 1]
+                        mask ^= low
+        self.eval_totals = totals
+
+    def _rank_at(self, sq, player):
+        """返回指定玩家在该格子上棋子的等级，没有则返回0"""
+        bit = 1 << sq
+        if not self.occupied[player] & bit:
+            return 0
+        masks = self.masks[player]
+        for rank in range(1, 9):
+            if masks[rank] & bit:
+                return rank
+        return 0
+
+    @property
+    def board(self):
+        """兼容接口：返回9x7的棋子二维列表（只读快照）"""
+        board = [[None for _ in range(COLS)] for _ in range(ROWS)]
+        for player in PLAYERS:
+            masks = self.masks[player]
+            for rank in range(1, 9):
+                mask = masks[rank]
+                while mask:
+                    low = mask & -mask
+                    row, col = divmod(low.bit_length() - 1, COLS)
+                    board[row][col] = PIECES[(player, rank)]
+                    mask ^= low
+        return board
+
+    def piece_at(self, row, col):
+        """返回指定位置的棋子（没有棋子时返回None）"""
+        sq = _square(row, col)
+        for player in PLAYERS:
+            rank = self._rank_at(sq, player)
+            if rank:
+                return PIECES[(player, rank)]
+        return None
+
+    def get_pieces(self, player):
+        """返回指定玩家的所有棋子，格式与 DoushouqiGame.get_pieces 相同
+
+        结果在局面改变前会被缓存，调用者不应修改返回的列表
+        """
+        pieces = self._pieces_cache.get(player)
+        if pieces is None:
+            pieces = []
+            mask = self.occupied[player]
+            while mask:
+                low = mask & -mask
+                sq = low.bit_length() - 1
+                row, col = divmod(sq, COLS)
+                pieces.append((PIECES[(player, self._rank_at(sq, player))], row, col))
+                mask ^= low
+            self._pieces_cache[player] = pieces
+        return pieces
+
+    def is_river(self, row, col):
+        return bool(RIVER_MASK >> _square(row, col) & 1)
+
+    def is_trap(self, row, col, player):
+        """检查指定位置是否是指定玩家的陷阱"""
+        return bool(TRAP_MASKS[player] >> _square(row, col) & 1)
+
+    def is_in_opponent_trap(self, row, col, player):
+        """检查指定位置的棋子是否在对方的陷阱中"""
+        opponent = 'blue' if player == 'red' else 'red'
+        return bool(TRAP_MASKS[opponent] >> _square(row, col) & 1)
+
+    def is_den(self, row, col, player):
+        return bool(DEN_MASKS[player] >> _square(row, col) & 1)
+
+    def is_valid_move(self, from_row, from_col, to_row, to_col, player):
+        if not (0 <= from_row < ROWS and 0 <= from_col < COLS
+                and 0 <= to_row < ROWS and 0 <= to_col < COLS):
+            return False
+        from_sq = _square(from_row, from_col)
+        rank = self._rank_at(from_sq, player)
+        if not rank:
+            return False
+        to_sq = _square(to_row, to_col)
+        if to_sq not in CANDIDATE_TARGETS[from_sq]:
+            return False
+        return self._can_move(from_sq, to_sq, rank, player)
+
+    def _can_move(self, from_sq, to_sq, rank, player):
+        """检查从from_sq到to_sq（必须是候选目标格）的移动是否合法"""
+        to_bit = 1 << to_sq
+
+        # 不能进入自己的兽穴，也不能走到自己棋子上
+        if DEN_MASKS[player] & to_bit or self.occupied[player] & to_bit:
+            return False
+
+        opponent = 'blue' if player == 'red' else 'red'
+        lane = JUMP_LANES[from_sq].get(to_sq)
+        if lane is not None:
+            # 只有狮虎可以跳河，且河中不能有棋子阻挡
+            if rank not in (6, 7):
+                return False
+            if (self.occupied['red'] | self.occupied['blue']) & lane:
+                return False
+            target_rank = self._rank_at(to_sq, opponent)
+            return not target_rank or rank >= target_rank
+
+        # 普通移动：只有老鼠可以下河
+        if RIVER_MASK & to_bit and rank != 1:
+            return False
+
+        target_rank = self._rank_at(to_sq, opponent)
+        if not target_rank:
+            return True
+
+        # 目标在它自己的陷阱中，不能被吃掉
+        if TRAP_MASKS[opponent] & to_bit:
+            return False
+
+        return CAPTURE_TABLE[capture_index(
+            rank, target_rank,
+            IS_RIVER_SQUARE[from_sq], IS_RIVER_SQUARE[to_sq],
+            TRAP_ATTACKER if TRAP_MASKS[player] & to_bit else TRAP_NONE
+        )]
+
+    def make_move(self, from_row, from_col, to_row, to_col):
+        """执行移动，返回值与 DoushouqiGame.make_move 相同（撤销记录中的被吃棋子为共享实例）"""
+        if self.game_over:
+            return False
+
+        player = self.current_player
+        if not self.is_valid_move(from_row, from_col, to_row, to_col, player):
+            return False
+
+        opponent = 'blue' if player == 'red' else 'red'
+        self._pieces_cache.clear()
+        from_sq = _square(from_row, from_col)
+        to_sq = _square(to_row, to_col)
+        self._attacks.mark(from_sq)
+        self._attacks.mark(to_sq)
+        from_bit = 1 << from_sq
+        to_bit = 1 << to_sq
+
+        # 移除被吃掉的棋子
+        target_rank = self._rank_at(to_sq, opponent)
+        captured = None
+        if target_rank:
+            captured = PIECES[(opponent, target_rank)]
+            self.masks[opponent][target_rank] ^= to_bit
+            self.occupied[opponent] ^= to_bit
+            self._piece_key ^= ZOBRIST_PIECES[(opponent, target_rank)][to_sq]
+            self.piece_count[opponent] -= 1
+            if self._eval_rows is not None:
+                self.eval_totals[opponent] -= self._eval_rows[opponent][target_rank][to_sq]
+
+        undo = (from_row, from_col, to_row, to_col, captured,
+                player, self.game_over, self.winner)
+        self._undo_stack.append(undo)
+
+        rank = self._rank_at(from_sq, player)
+        self.masks[player][rank] ^= from_bit | to_bit
+        self.occupied[player] ^= from_bit | to_bit
+        keys = ZOBRIST_PIECES[(player, rank)]
+        self._piece_key ^= keys[from_sq] ^ keys[to_sq]
+        if self._eval_rows is not None:
+            eval_row = self._eval_rows[player][rank]
+            self.eval_totals[player] += eval_row[to_sq] - eval_row[from_sq]
+
+        # 检查是否进入对方兽穴，或吃掉对方所有棋子
+        if DEN_MASKS[opponent] & to_bit or not self.occupied[opponent]:
+            self.game_over = True
+            self.winner = player
+            return undo
+
+        # 切换玩家
+        self.current_player = opponent
+        return undo
+
+    def unmake_move(self, undo=None):
+        """撤销最近一次 make_move，用法与 DoushouqiGame.unmake_move 相同"""
+        if not self._undo_stack:
+            raise ValueError('没有可以撤销的移动')
+        if undo is not None and undo is not self._undo_stack[-1]:
+            raise ValueError('只能撤销最近一次移动')
+
+        record = self._undo_stack.pop()
+        from_row, from_col, to_row, to_col, captured, player, game_over, winner = record
+        self._pieces_cache.clear()
+        from_sq = _square(from_row, from_col)
+        to_sq = _square(to_row, to_col)
+        self._attacks.mark(from_sq)
+        self._attacks.mark(to_sq)
+        move_bits = (1 << from_sq) | (1 << to_sq)
+
+        rank = self._rank_at(to_sq, player)
+        self.masks[player][rank] ^= move_bits
+        self.occupied[player] ^= move_bits
+        keys = ZOBRIST_PIECES[(player, rank)]
+        self._piece_key ^= keys[from_sq] ^ keys[to_sq]
+        eval_rows = self._eval_rows
+        if eval_rows is not None:
+            eval_row = eval_rows[player][rank]
+            self.eval_totals[player] += eval_row[from_sq] - eval_row[to_sq]
+        if captured:
+            self._put(to_sq, captured.player, captured.rank)
+            self._piece_key ^= ZOBRIST_PIECES[(captured.player, captured.rank)][to_sq]
+            self.piece_count[captured.player] += 1
+            if eval_rows is not None:
+                self.eval_totals[captured.player] += eval_rows[captured.player][captured.rank][to_sq]
+
+        self.current_player = player
+        self.game_over = game_over
+        self.winner = winner
+        return record
+
+    def get_valid_moves(self, player):
+        attacks = self._attacks
+        attacks.refresh(self)
+        targets = attacks.targets
+        moves = []
+        # 按格子编号升序遍历，与 DoushouqiGame 的移动顺序一致
+        for piece, from_row, from_col in self.get_pieces(player):
+            for to_sq in targets[_square(from_row, from_col)][2]:
+                to_row, to_col = divmod(to_sq, COLS)
+                moves.append((from_row, from_col, to_row, to_col))
+        return moves
+
+    def generate_moves(self, player):
+        """与 DoushouqiGame.generate_moves 相同"""
+        return self._attacks.staged_moves(self, player)
+
+    def has_any_legal_move(self, player):
+        """与 DoushouqiGame.has_any_legal_move 相同"""
+        masks = self.masks[player]
+        for rank in range(1, 9):
+            mask = masks[rank]
+            while mask:
+                low = mask & -mask
+                from_sq = low.bit_length() - 1
+                for to_sq in CANDIDATE_TARGETS[from_sq]:
+                    if self._can_move(from_sq, to_sq, rank, player):
+                        return True
+                mask ^= low
+        return False
+
+    def _legal_targets(self, sq):
+        """计算格子上棋子的合法目标格子，供 AttackMaps 使用"""
+        bit = 1 << sq
+        player = 'red' if self.occupied['red'] & bit else 'blue' if self.occupied['blue'] & bit else None
+        if player is None:
+            return None
+        rank = self._rank_at(sq, player)
+        return player, rank, tuple(
+            to_sq for to_sq in CANDIDATE_TARGETS[sq] if self._can_move(sq, to_sq, rank, player)
+        )
+
+    def attackers(self, row, col, player):
+        """与 DoushouqiGame.attackers 相同"""
+        self._attacks.refresh(self)
+        return self._attacks.attackers[player][_square(row, col)]
+
+    def legal_targets(self, row, col):
+        """与 DoushouqiGame.legal_targets 相同"""
+        self._attacks.refresh(self)
+        entry = self._attacks.targets.get(_square(row, col))
+        return entry[2] if entry else ()
+
+    def mobility(self, player):
+        """与 DoushouqiGame.mobility 相同"""
+        self._attacks.refresh(self)
+        return self._attacks.mobility[player]
+
+    def get_board_state(self):
+        state = []
+        for row in self.board:
+            row_state = []
+            for piece in row:
+                if piece:
+                    row_state.append({
+                        'name': piece.name,
+                        'rank': piece.rank,
+                        'player': piece.player
+                    })
+                else:
+                    row_state.append(None)
+            state.append(row_state)
+        return state
+
+    def clone(self):
+        new_game = BitboardGame.__new__(BitboardGame)
+        new_game.masks = {'red': self.masks['red'][:], 'blue': self.masks['blue'][:]}
+        new_game.occupied = dict(self.occupied)
+        new_game._pieces_cache = {}
+        new_game._undo_stack = []
+        new_game.current_player = self.current_player
+        new_game.game_over = self.game_over
+        new_game.winner = self.winner
+        new_game._piece_key = self._piece_key
+        new_game.piece_count = dict(self.piece_count)
+        new_game.eval_table = self.eval_table
+        new_game._eval_rows = self._eval_rows
+        new_game.eval_totals = dict(self.eval_totals)
+        new_game._attacks = AttackMaps()
+        return new_game
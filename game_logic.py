@@ -1,10 +1,226 @@
 # 斗兽棋游戏逻辑
 
+import random
+from types import MappingProxyType
+
+# 初始布局：(名称, 等级, 玩家, (行, 列))
+INITIAL_PIECES = [
+    # 红方棋子（原来蓝方的位置）
+    ('象', 8, 'red', (8, 6)), ('狮', 7, 'red', (8, 0)),
+    ('虎', 6, 'red', (7, 5)), ('豹', 5, 'red', (7, 1)),
+    ('狼', 4, 'red', (6, 6)), ('狗', 3, 'red', (6, 0)),
+    ('猫', 2, 'red', (7, 6)), ('鼠', 1, 'red', (6, 4)),
+
+    # 蓝方棋子（原来红方的位置）
+    ('象', 8, 'blue', (0, 0)), ('狮', 7, 'blue', (0, 6)),
+    ('虎', 6, 'blue', (1, 1)), ('豹', 5, 'blue', (1, 5)),
+    ('狼', 4, 'blue', (2, 0)), ('狗', 3, 'blue', (2, 6)),
+    ('猫', 2, 'blue', (1, 0)), ('鼠', 1, 'blue', (2, 2))
+]
+
+# 等级对应的棋子名称
+PIECE_NAMES = {8: '象', 7: '狮', 6: '虎', 5: '豹', 4: '狼', 3: '狗', 2: '猫', 1: '鼠'}
+
+# 棋盘尺寸，格子编号为 行 * COLS + 列
+ROWS = 9
+COLS = 7
+SQUARES = ROWS * COLS
+
+# 棋盘地形，所有局面共享，不可修改
+# 河流位置
+RIVER_POSITIONS = (
+    (3, 1), (3, 2), (4, 1), (4, 2), (5, 1), (5, 2),
+    (3, 4), (3, 5), (4, 4), (4, 5), (5, 4), (5, 5)
+)
+
+# 兽穴位置
+DEN_POSITIONS = MappingProxyType({'red': (8, 3), 'blue': (0, 3)})
+
+# 陷阱位置：每方兽穴周围的三个陷阱
+TRAP_POSITIONS = MappingProxyType({
+    'red': ((8, 2), (8, 4), (7, 3)),
+    'blue': ((0, 2), (0, 4), (1, 3))
+})
+
+# 格子类型编码
+SQUARE_LAND = 0
+SQUARE_RIVER = 1
+SQUARE_TRAP = MappingProxyType({'red': 2, 'blue': 3})
+SQUARE_DEN = MappingProxyType({'red': 4, 'blue': 5})
+
+
+def _build_square_types():
+    """每个格子的类型编码（陆地、河流、某方的陷阱或兽穴）"""
+    types = bytearray(SQUARES)
+    for row, col in RIVER_POSITIONS:
+        types[row * COLS + col] = SQUARE_RIVER
+    for player, traps in TRAP_POSITIONS.items():
+        for row, col in traps:
+            types[row * COLS + col] = SQUARE_TRAP[player]
+    for player, (row, col) in DEN_POSITIONS.items():
+        types[row * COLS + col] = SQUARE_DEN[player]
+    return bytes(types)
+
+
+SQUARE_TYPES = _build_square_types()
+
+
+def _build_neighbours():
+    """每个格子上下左右相邻的格子"""
+    table = []
+    for sq in range(SQUARES):
+        row, col = divmod(sq, COLS)
+        neighbours = []
+        for dr, dc in ((-1, 0), (0, -1), (0, 1), (1, 0)):
+            r, c = row + dr, col + dc
+            if 0 <= r < ROWS and 0 <= c < COLS:
+                neighbours.append((r, c))
+        table.append(tuple(neighbours))
+    return table
+
+
+def _build_river_jumps():
+    """每个格子狮虎跳河的目标格子，以及中间经过的河流格子"""
+    table = []
+    for sq in range(SQUARES):
+        row, col = divmod(sq, COLS)
+        jumps = []
+        # 纵向跳过3格河流，横向跳过2格河流
+        for dr, dc, span in ((-1, 0, 4), (0, -1, 3), (0, 1, 3), (1, 0, 4)):
+            to_row, to_col = row + dr * span, col + dc * span
+            if not (0 <= to_row < ROWS and 0 <= to_col < COLS):
+                continue
+            river_cells = tuple((row + dr * i, col + dc * i) for i in range(1, span))
+            if all(SQUARE_TYPES[r * COLS + c] == SQUARE_RIVER for r, c in river_cells):
+                jumps.append(((to_row, to_col), river_cells))
+        table.append(tuple(jumps))
+    return table
+
+
+# 每个格子是否是河流（False表示陆地）
+IS_RIVER_SQUARE = tuple(square_type == SQUARE_RIVER for square_type in SQUARE_TYPES)
+# 每个格子是哪一方的陷阱（不是陷阱为None）
+TRAP_OWNER = tuple(
+    'red' if square_type == SQUARE_TRAP['red'] else 'blue' if square_type == SQUARE_TRAP['blue'] else None
+    for square_type in SQUARE_TYPES
+)
+NEIGHBOURS = _build_neighbours()
+RIVER_JUMPS = _build_river_jumps()
+
+# 每个格子的候选目标：(目标行, 目标列, 经过的河流格子编号)，普通移动的河流格子为None
+# 按目标格子的行列顺序排列，与逐格扫描得到的移动顺序一致
+MOVE_TABLE = [
+    tuple(sorted(
+        [(r, c, None) for r, c in NEIGHBOURS[sq]] +
+        [(r, c, tuple(cr * COLS + cc for cr, cc in cells)) for (r, c), cells in RIVER_JUMPS[sq]],
+        key=lambda target: (target[0], target[1])
+    ))
+    for sq in range(SQUARES)
+]
+
+
+def _build_den_distances():
+    """用广度优先搜索计算每方每种棋子从每个格子走到对方兽穴最少需要的步数
+
+    考虑河流（只有老鼠能下河）、狮虎跳河（假设河中无阻挡）以及不能进入自己的兽穴，
+    不考虑其他棋子。棋子无法站立的格子（非老鼠的河流格子、自己的兽穴）为 DEN_UNREACHABLE
+    """
+    table = {}
+    for player in ('red', 'blue'):
+        opponent = 'blue' if player == 'red' else 'red'
+        den_row, den_col = DEN_POSITIONS[opponent]
+        own_den = SQUARE_DEN[player]
+        for rank in range(1, 9):
+            def can_stand(sq):
+                square_type = SQUARE_TYPES[sq]
+                return square_type != own_den and (square_type != SQUARE_RIVER or rank == 1)
+
+            distances = [DEN_UNREACHABLE] * SQUARES
+            start = den_row * COLS + den_col
+            distances[start] = 0
+            queue = [start]
+            for sq in queue:
+                sources = [r * COLS + c for r, c in NEIGHBOURS[sq]]
+                if rank in (6, 7):
+                    sources += [r * COLS + c for (r, c), _ in RIVER_JUMPS[sq]]
+                for source in sources:
+                    if distances[source] == DEN_UNREACHABLE and can_stand(source):
+                        distances[source] = distances[sq] + 1
+                        queue.append(source)
+            table[(player, rank)] = tuple(distances)
+    return table
+
+
+# DEN_DISTANCE[(玩家, 等级)][格子编号]：该棋子从该格子走到对方兽穴最少需要的步数
+DEN_UNREACHABLE = 99
+DEN_DISTANCE = _build_den_distances()
+
+
+def _build_affected_squares():
+    """每个格子的内容改变后，需要重新计算走法的起点格子
+
+    包括格子本身、相邻格子、跳河能落到该格的格子，以及跳河路线经过该格的格子
+    """
+    table = [{sq} | {r * COLS + c for r, c in NEIGHBOURS[sq]} for sq in range(SQUARES)]
+    for sq in range(SQUARES):
+        for (to_row, to_col), river_cells in RIVER_JUMPS[sq]:
+            table[to_row * COLS + to_col].add(sq)
+            for r, c in river_cells:
+                table[r * COLS + c].add(sq)
+    return [tuple(sorted(squares)) for squares in table]
+
+
+AFFECTED_SQUARES = _build_affected_squares()
+
+
+def _build_zobrist_keys():
+    """生成Zobrist随机数：每个(玩家, 等级, 格子)一个64位整数
+
+    使用固定种子，保证不同进程、不同次运行得到相同的哈希值
+    """
+    rng = random.Random(20240601)
+    keys = {}
+    for player in ('red', 'blue'):
+        for rank in range(1, 9):
+            keys[(player, rank)] = tuple(rng.getrandbits(64) for _ in range(SQUARES))
+    return keys, rng.getrandbits(64)
+
+
+# ZOBRIST_SIDE 在轮到蓝方走棋时异或进哈希值
+ZOBRIST_PIECES, ZOBRIST_SIDE = _build_zobrist_keys()
+
+
+def piece_code(player, rank):
+    """棋子编码：红方为1~8，蓝方为9~16，0表示空格"""
+    return rank if player == 'red' else rank + 8
+
+
+# 按棋子编码索引的玩家、等级和Zobrist随机数
+CODE_PLAYER = (None,) + ('red',) * 8 + ('blue',) * 8
+CODE_RANK = (0,) + tuple(range(1, 9)) * 2
+ZOBRIST_BY_CODE = (None,) + tuple(
+    ZOBRIST_PIECES[(CODE_PLAYER[code], CODE_RANK[code])] for code in range(1, 17)
+)
+
+
 class Piece:
+    # 棋子只有16种，棋盘上只保存编码，读取时返回 PIECES 中共享的实例
+    __slots__ = ('name', 'rank', 'player', 'code')
+
     def __init__(self, name, rank, player):
         self.name = name
         self.rank = rank
         self.player = player  # 'red' or 'blue'
+        self.code = piece_code(player, rank)
+
+    def __eq__(self, other):
+        return isinstance(other, Piece) and self.code == other.code
+
+    def __hash__(self):
+        return self.code
+
+    def __repr__(self):
+        return f'Piece({self.name!r}, {self.rank}, {self.player!r})'
 
     def can_capture(self, other, other_in_trap=False, self_in_river=False, other_in_river=False):
         """检查是否可以吃掉对方棋子
@@ -47,53 +263,362 @@ class Piece:
 
         return False
 
+
+# 共享的棋子实例，下标为棋子编码（PIECES[0] 为None，表示空格）
+PIECES = (None,) + tuple(
+    Piece(PIECE_NAMES[CODE_RANK[code]], CODE_RANK[code], CODE_PLAYER[code]) for code in range(1, 17)
+)
+
+
+# 局面字符串中的棋子字母：红方大写，蓝方小写（鼠猫狗狼豹虎狮象）
+PIECE_LETTERS = {1: 'R', 2: 'C', 3: 'D', 4: 'W', 5: 'P', 6: 'T', 7: 'L', 8: 'E'}
+CODE_LETTER = (None,) + tuple(
+    PIECE_LETTERS[CODE_RANK[code]] if CODE_PLAYER[code] == 'red' else PIECE_LETTERS[CODE_RANK[code]].lower()
+    for code in range(1, 17)
+)
+LETTER_CODE = {letter: code for code, letter in enumerate(CODE_LETTER) if letter}
+# 局面字符串中的玩家字母，'-' 表示没有胜者
+PLAYER_LETTERS = {'red': 'r', 'blue': 'b', None: '-'}
+LETTER_PLAYER = {letter: player for player, letter in PLAYER_LETTERS.items()}
+
+# 吃子时目标格子的陷阱状态
+TRAP_NONE = 0      # 不在陷阱中
+TRAP_DEFENDER = 1  # 在被吃方自己的陷阱中（不能被吃）
+TRAP_ATTACKER = 2  # 在进攻方的陷阱中（任何棋子都可以吃）
+
+
+def capture_index(rank, target_rank, self_in_river, other_in_river, trap_status):
+    """CAPTURE_TABLE 的下标：(进攻方等级, 被吃方等级, 进攻方是否在河中, 被吃方是否在河中, 陷阱状态)"""
+    return (((rank * 9 + target_rank) * 2 + self_in_river) * 2 + other_in_river) * 3 + trap_status
+
+
+def _reference_capture(rank, target_rank, self_in_river, other_in_river, trap_status):
+    """按原来的分支规则判断一次相邻吃子是否合法（Piece.can_capture 加上移动检查中的河流限制）"""
+    if trap_status == TRAP_DEFENDER:
+        return False
+    attacker = PIECES[piece_code('red', rank)]
+    target = PIECES[piece_code('blue', target_rank)]
+    if not attacker.can_capture(target, trap_status == TRAP_ATTACKER, self_in_river, other_in_river):
+        return False
+    # 老鼠不能从水里吃岸上的棋子
+    if rank == 1 and self_in_river and not other_in_river:
+        return False
+    # 岸上的棋子不能吃水里的老鼠
+    if rank != 1 and not self_in_river and other_in_river:
+        return False
+    return True
+
+
+# 吃子规则表：用 capture_index 计算下标，值为True表示可以吃
+# 表中每一项都由 _reference_capture 逐条规则算出，与分支判断的结果完全一致
+CAPTURE_TABLE = tuple(
+    bool(rank and target_rank) and _reference_capture(rank, target_rank, self_in_river, other_in_river, trap_status)
+    for rank in range(9)
+    for target_rank in range(9)
+    for self_in_river in (False, True)
+    for other_in_river in (False, True)
+    for trap_status in (TRAP_NONE, TRAP_DEFENDER, TRAP_ATTACKER)
+)
+
+
+class AttackMaps:
+    """每方的攻击图：每个棋子能走到（或吃到）哪些格子，每个格子能被哪些棋子走到
+
+    局面改变时只记录改动过的格子，查询前由 refresh 重新计算受影响的棋子。
+    局面需要提供 _legal_targets(sq)，返回 (玩家, 等级, 目标格子元组)，空格返回None
+    """
+
+    __slots__ = ('targets', 'attackers', 'mobility', '_dirty')
+
+    def __init__(self):
+        # targets[起点格子] = (玩家, 等级, 合法目标格子元组)，目标格子按行列顺序排列
+        # 为None时表示需要全部重新计算
+        self.targets = None
+        # attackers[玩家][目标格子] = {起点格子: 等级}
+        self.attackers = None
+        # 每方合法移动的数量
+        self.mobility = None
+        self._dirty = set()
+
+    def mark(self, sq):
+        """记录格子内容发生了变化"""
+        self._dirty.add(sq)
+
+    def mark_all(self):
+        self.targets = None
+        self._dirty.clear()
+
+    def refresh(self, game):
+        """重新计算受改动格子影响的棋子的走法"""
+        if self.targets is None:
+            self._rebuild(game)
+            return
+        dirty = self._dirty
+        if not dirty:
+            return
+        squares = set()
+        for sq in dirty:
+            squares.update(AFFECTED_SQUARES[sq])
+        dirty.clear()
+
+        targets = self.targets
+        attackers = self.attackers
+        mobility = self.mobility
+        for sq in squares:
+            old = targets.pop(sq, None)
+            if old is not None:
+                player, rank, to_squares = old
+                player_attackers = attackers[player]
+                for to_sq in to_squares:
+                    del player_attackers[to_sq][sq]
+                mobility[player] -= len(to_squares)
+
+            new = game._legal_targets(sq)
+            if new is not None:
+                player, rank, to_squares = new
+                targets[sq] = new
+                player_attackers = attackers[player]
+                for to_sq in to_squares:
+                    player_attackers[to_sq][sq] = rank
+                mobility[player] += len(to_squares)
+
+    def _rebuild(self, game):
+        """重新计算所有棋子的走法"""
+        self.targets = targets = {}
+        self.attackers = attackers = {'red': [{} for _ in range(SQUARES)], 'blue': [{} for _ in range(SQUARES)]}
+        self.mobility = mobility = {'red': 0, 'blue': 0}
+        self._dirty.clear()
+        for player in ('red', 'blue'):
+            for piece, row, col in game.get_pieces(player):
+                sq = row * COLS + col
+                entry = game._legal_targets(sq)
+                targets[sq] = entry
+                player_attackers = attackers[player]
+                for to_sq in entry[2]:
+                    player_attackers[to_sq][sq] = entry[1]
+                mobility[player] += len(entry[2])
+
+    def staged_moves(self, game, player):
+        """按阶段逐个生成合法移动：进入对方兽穴、吃子（被吃棋子等级从高到低）、普通移动
+
+        同一被吃棋子按进攻方等级从低到高排列；普通移动按起点、终点的行列顺序排列。
+        调用者中途停止迭代时，后面阶段的移动不会被生成。
+        每个阶段开始时才读取攻击图，所以调用者可以在两次迭代之间走子再撤销（搜索中的用法）
+        """
+        opponent = 'blue' if player == 'red' else 'red'
+        den_row, den_col = DEN_POSITIONS[opponent]
+        den_sq = den_row * COLS + den_col
+
+        # 1. 进入对方兽穴
+        self.refresh(game)
+        den_moves = [(from_sq // COLS, from_sq % COLS, den_row, den_col)
+                     for from_sq in sorted(self.attackers[player][den_sq])]
+        yield from den_moves
+
+        # 2. 吃子
+        self.refresh(game)
+        attackers = self.attackers[player]
+        captures = []
+        for victim, to_row, to_col in sorted(game.get_pieces(opponent), key=lambda item: -item[0].rank):
+            to_attackers = attackers[to_row * COLS + to_col]
+            for from_sq in sorted(to_attackers, key=lambda sq: (to_attackers[sq], sq)):
+                captures.append((from_sq // COLS, from_sq % COLS, to_row, to_col))
+        yield from captures
+
+        # 3. 普通移动
+        self.refresh(game)
+        targets = self.targets
+        piece_at = game.piece_at
+        quiet_moves = [
+            (from_row, from_col, to_sq // COLS, to_sq % COLS)
+            for piece, from_row, from_col in game.get_pieces(player)
+            for to_sq in targets[from_row * COLS + from_col][2]
+            if to_sq != den_sq and piece_at(to_sq // COLS, to_sq % COLS) is None
+        ]
+        yield from quiet_moves
+
+
+class _BoardRow:
+    """棋盘一行的视图：读取时返回共享的棋子实例，写入时同步更新局面"""
+
+    __slots__ = ('_game', '_start')
+
+    def __init__(self, game, row):
+        self._game = game
+        self._start = row * COLS
+
+    def __getitem__(self, col):
+        cells = self._game.cells[self._start:self._start + COLS]
+        if isinstance(col, slice):
+            return [PIECES[code] for code in cells[col]]
+        return PIECES[cells[col]]
+
+    def __setitem__(self, col, piece):
+        if not -COLS <= col < COLS:
+            raise IndexError('列号超出棋盘范围')
+        self._game._set_square(self._start + col % COLS, piece)
+
+    def __len__(self):
+        return COLS
+
+    def __iter__(self):
+        cells = self._game.cells
+        return (PIECES[cells[sq]] for sq in range(self._start, self._start + COLS))
+
+
+class _BoardView:
+    """board 属性返回的9x7棋盘视图，棋子编码实际保存在局面的 cells 字节数组中"""
+
+    __slots__ = ('_rows',)
+
+    def __init__(self, game):
+        self._rows = tuple(_BoardRow(game, row) for row in range(ROWS))
+
+    def __getitem__(self, row):
+        return self._rows[row]
+
+    def __setitem__(self, row, pieces):
+        row_view = self._rows[row]
+        for col, piece in enumerate(pieces):
+            row_view[col] = piece
+
+    def __len__(self):
+        return ROWS
+
+    def __iter__(self):
+        return iter(self._rows)
+
+
 class DoushouqiGame:
+    # 河流、兽穴和陷阱位置，所有局面共享
+    river_positions = RIVER_POSITIONS
+    den_positions = DEN_POSITIONS
+    trap_positions = TRAP_POSITIONS
+
     def __init__(self):
-        self.board = [[None for _ in range(7)] for _ in range(9)]
+        # 棋盘：每个格子一个字节的棋子编码（见 piece_code），格子编号为 行 * 7 + 列
+        self.cells = bytearray(SQUARES)
+        self._board_view = None  # 第一次访问 board 时创建
+        self._attacks = AttackMaps()
+        self.eval_table = None  # 增量评估表，见 set_eval_table
+        self.resync()
         self.current_player = 'red'
         self.game_over = False
         self.winner = None
+        self._undo_stack = []  # make_move 的撤销记录
         self.init_board()
-        
-        # 河流位置
-        self.river_positions = [
-            (3, 1), (3, 2), (4, 1), (4, 2), (5, 1), (5, 2),
-            (3, 4), (3, 5), (4, 4), (4, 5), (5, 4), (5, 5)
-        ]
-        
-        # 兽穴位置（对换）
-        self.den_positions = {
-            'red': (8, 3),
-            'blue': (0, 3)
-        }
-
-        # 陷阱位置（对换）
-        self.trap_positions = {
-            'red': [(8, 2), (8, 4), (7, 3)],
-            'blue': [(0, 2), (0, 4), (1, 3)]
-        }
+
+    @classmethod
+    def _from_cells(cls, cells, current_player, game_over, winner):
+        """直接用棋子编码构造局面，不经过 __init__ 的初始布局"""
+        game = cls.__new__(cls)
+        game.cells = bytearray(cells)
+        game._board_view = None
+        game._attacks = AttackMaps()
+        game.eval_table = None
+        game.resync()
+        game.current_player = current_player
+        game.game_over = game_over
+        game.winner = winner
+        game._undo_stack = []
+        return game
 
     def init_board(self):
         # 初始化棋子
-        pieces = [
-            # 红方棋子（原来蓝方的位置）
-            ('象', 8, 'red', (8, 6)), ('狮', 7, 'red', (8, 0)),
-            ('虎', 6, 'red', (7, 5)), ('豹', 5, 'red', (7, 1)),
-            ('狼', 4, 'red', (6, 6)), ('狗', 3, 'red', (6, 0)),
-            ('猫', 2, 'red', (7, 6)), ('鼠', 1, 'red', (6, 4)),
-
-            # 蓝方棋子（原来红方的位置）
-            ('象', 8, 'blue', (0, 0)), ('狮', 7, 'blue', (0, 6)),
-            ('虎', 6, 'blue', (1, 1)), ('豹', 5, 'blue', (1, 5)),
-            ('狼', 4, 'blue', (2, 0)), ('狗', 3, 'blue', (2, 6)),
-            ('猫', 2, 'blue', (1, 0)), ('鼠', 1, 'blue', (2, 2))
-        ]
-        
-        for name, rank, player, (row, col) in pieces:
+        for name, rank, player, (row, col) in INITIAL_PIECES:
             self.board[row][col] = Piece(name, rank, player)
 
+    @property
+    def board(self):
+        """9x7的棋盘视图，board[行][列] 为棋子或None
+
+        写入格子（board[r][c] = piece）和整体赋值都会同步更新哈希值和棋子索引
+        """
+        if self._board_view is None:
+            self._board_view = _BoardView(self)
+        return self._board_view
+
+    @board.setter
+    def board(self, rows):
+        self.cells[:] = bytes(SQUARES)
+        self.resync()
+        for row, pieces in enumerate(rows):
+            self.board[row] = pieces
+
+    @property
+    def zobrist_key(self):
+        """局面的64位Zobrist哈希值：所有(格子, 玩家, 等级)的随机数，轮到蓝方时再异或 ZOBRIST_SIDE"""
+        if self.current_player == 'blue':
+            return self._piece_key ^ ZOBRIST_SIDE
+        return self._piece_key
+
+    def resync(self):
+        """根据 cells 重新计算派生状态：棋子部分的哈希值、每方的棋子索引和棋子数量 piece_count
+
+        通过 board 修改棋盘时会自动增量维护这些状态，一般不需要手动调用
+        """
+        key = 0
+        # 每方一个 {格子编号: 棋子} 的索引
+        self._pieces = {'red': {}, 'blue': {}}
+        for sq, code in enumerate(self.cells):
+            if code:
+                key ^= ZOBRIST_BY_CODE[code][sq]
+                self._pieces[CODE_PLAYER[code]][sq] = PIECES[code]
+        self.piece_count = {player: len(pieces) for player, pieces in self._pieces.items()}
+        self._pieces_cache = {}
+        self._piece_key = key
+        self._attacks.mark_all()
+        self._sum_eval_totals()
+
+    def set_eval_table(self, table):
+        """设置增量评估表：table[棋子编码][格子编号] 是该棋子放在该格子上时给所属玩家的分数
+
+        设置后 eval_totals[玩家] 保存该玩家所有棋子的分数之和，走子和撤销时只更新变化的格子；
+        table 为 None 时不维护
+        """
+        self.eval_table = table
+        self._sum_eval_totals()
+
+    def _sum_eval_totals(self):
+        """根据当前棋盘重新计算 eval_totals"""
+        totals = {'red': 0, 'blue': 0}
+        table = self.eval_table
+        if table is not None:
+            for sq, code in enumerate(self.cells):
+                if code:
+                    totals[CODE_PLAYER[code]] += table[code][sq]
+        self.eval_totals = totals
+
+    def _set_square(self, sq, piece):
+        """把棋子（或None）放到指定格子"""
+        self._set_code(sq, piece.code if piece else 0)
+
+    def _set_code(self, sq, code):
+        """修改格子的棋子编码，同时增量更新哈希值、棋子索引、棋子数量和评估分数"""
+        old = self.cells[sq]
+        if old == code:
+            return
+        table = self.eval_table
+        if old:
+            player = CODE_PLAYER[old]
+            self._piece_key ^= ZOBRIST_BY_CODE[old][sq]
+            del self._pieces[player][sq]
+            self.piece_count[player] -= 1
+            if table is not None:
+                self.eval_totals[player] -= table[old][sq]
+        self.cells[sq] = code
+        if code:
+            player = CODE_PLAYER[code]
+            self._piece_key ^= ZOBRIST_BY_CODE[code][sq]
+            self._pieces[player][sq] = PIECES[code]
+            self.piece_count[player] += 1
+            if table is not None:
+                self.eval_totals[player] += table[code][sq]
+        self._pieces_cache.clear()
+        self._attacks.mark(sq)
+
     def is_river(self, row, col):
-        return (row, col) in self.river_positions
+        return SQUARE_TYPES[row * COLS + col] == SQUARE_RIVER
 
     def is_trap(self, row, col, player):
         """检查指定位置是否是指定玩家的陷阱
@@ -106,7 +631,7 @@ class DoushouqiGame:
         Returns:
             该位置是否是该玩家的陷阱
         """
-        return (row, col) in self.trap_positions[player]
+        return SQUARE_TYPES[row * COLS + col] == SQUARE_TRAP[player]
 
     def is_in_opponent_trap(self, row, col, player):
         """检查指定位置的棋子是否在对方的陷阱中
@@ -120,170 +645,238 @@ class DoushouqiGame:
             该棋子是否在对方的陷阱中
         """
         opponent = 'blue' if player == 'red' else 'red'
-        return (row, col) in self.trap_positions[opponent]
+        return SQUARE_TYPES[row * COLS + col] == SQUARE_TRAP[opponent]
 
     def is_den(self, row, col, player):
-        return (row, col) == self.den_positions[player]
+        return SQUARE_TYPES[row * COLS + col] == SQUARE_DEN[player]
 
     def is_valid_move(self, from_row, from_col, to_row, to_col, player):
-        piece = self.board[from_row][from_col]
+        if not (0 <= from_row < ROWS and 0 <= from_col < COLS):
+            return False
+        piece = PIECES[self.cells[from_row * COLS + from_col]]
         if not piece or piece.player != player:
             return False
 
+        # 只有移动表中的格子才可能是合法目标（相邻一格或狮虎跳河）
+        for target_row, target_col, river_squares in MOVE_TABLE[from_row * COLS + from_col]:
+            if target_row == to_row and target_col == to_col:
+                return self._check_move(piece, from_row, from_col, to_row, to_col, river_squares, player)
+        return False
+
+    def _check_move(self, piece, from_row, from_col, to_row, to_col, river_squares, player):
+        """检查移动表中的一个候选移动是否合法
+
+        Args:
+            piece: 要移动的棋子
+            river_squares: 跳河时经过的河流格子编号，普通移动为None
+            player: 当前玩家
+
+        Returns:
+            是否是合法移动
+        """
         # 检查是否移动到自己的兽穴
         if self.is_den(to_row, to_col, player):
             return False
 
-        # 检查移动距离（只能移动一格）
-        row_diff = abs(to_row - from_row)
-        col_diff = abs(to_col - from_col)
+        cells = self.cells
+        to_sq = to_row * COLS + to_col
+        target = PIECES[cells[to_sq]]
 
         # 狮子和老虎可以跳过河流
-        if piece.rank in [6, 7]:
-            # 检查是否尝试跳过河流
-            # 纵向跳跃（从河边跳到对岸）
-            if row_diff == 4 and col_diff == 0:
-                # 检查是否跨越河流
-                river_cells = []
-                if from_row < to_row:
-                    river_cells = [(from_row + 1, from_col), (from_row + 2, from_col), (from_row + 3, from_col)]
-                else:
-                    river_cells = [(from_row - 1, from_col), (from_row - 2, from_col), (from_row - 3, from_col)]
-
-                # 检查中间是否都是河流
-                if all(self.is_river(r, c) for r, c in river_cells):
-                    # 检查河中是否有老鼠阻挡
-                    if all(self.board[r][c] is None for r, c in river_cells):
-                        # 检查目标位置
-                        target = self.board[to_row][to_col]
-                        if target:
-                            # 如果目标是对手棋子，检查是否可以吃掉
-                            if target.player == player:
-                                return False
-
-                            # 检查是否可以吃掉目标
-                            if not piece.can_capture(target, other_in_trap=False):
-                                return False
-                        return True
-            # 横向跳跃（从河边跳到对岸）
-            elif col_diff == 3 and row_diff == 0:
-                # 检查是否跨越河流
-                river_cells = []
-                if from_col < to_col:
-                    river_cells = [(from_row, from_col + 1), (from_row, from_col + 2)]
-                else:
-                    river_cells = [(from_row, from_col - 1), (from_row, from_col - 2)]
-
-                # 检查中间是否都是河流
-                if all(self.is_river(r, c) for r, c in river_cells):
-                    # 检查河中是否有老鼠阻挡
-                    if all(self.board[r][c] is None for r, c in river_cells):
-                        # 检查目标位置
-                        target = self.board[to_row][to_col]
-                        if target:
-                            # 如果目标是对手棋子，检查是否可以吃掉
-                            if target.player == player:
-                                return False
-
-                            # 检查是否可以吃掉目标
-                            if not piece.can_capture(target, other_in_trap=False):
-                                return False
-                        return True
-
-        # 普通移动（每次只能移动一格）
-        if row_diff + col_diff != 1:
-            return False
+        if river_squares is not None:
+            if piece.rank not in (6, 7):
+                return False
+
+            # 检查河中是否有老鼠阻挡
+            for sq in river_squares:
+                if cells[sq]:
+                    return False
+
+            if target:
+                # 如果目标是对手棋子，检查是否可以吃掉（跳河的落点都在岸上且不是陷阱）
+                if target.player == player:
+                    return False
+                return CAPTURE_TABLE[capture_index(piece.rank, target.rank, False, False, TRAP_NONE)]
+            return True
 
         # 检查是否进入河流
-        if self.is_river(to_row, to_col) and piece.rank != 1:
+        to_in_river = IS_RIVER_SQUARE[to_sq]
+        if to_in_river and piece.rank != 1:
             return False
 
         # 检查目标位置
-        target = self.board[to_row][to_col]
         if target:
             if target.player == player:
                 return False
 
-            # 检查目标棋子是否在当前玩家的陷阱中（即目标棋子在对方的陷阱中）
-            target_in_my_trap = self.is_in_opponent_trap(to_row, to_col, target.player)
+            # 目标在它自己的陷阱中不能被吃，在当前玩家的陷阱中可以被任何棋子吃
+            trap_owner = TRAP_OWNER[to_sq]
+            if trap_owner is None:
+                trap_status = TRAP_NONE
+            elif trap_owner == player:
+                trap_status = TRAP_ATTACKER
+            else:
+                trap_status = TRAP_DEFENDER
 
-            # 检查目标棋子是否在它自己的陷阱中（如果在自己陷阱中，不能被吃掉）
-            target_in_its_own_trap = self.is_trap(to_row, to_col, target.player)
-
-            # 如果目标棋子在它自己的陷阱中，不能被吃掉
-            if target_in_its_own_trap:
-                return False
-
-            # 检查是否可以吃掉目标
-            self_in_river = self.is_river(from_row, from_col)
-            other_in_river = self.is_river(to_row, to_col)
-
-            if not piece.can_capture(target, target_in_my_trap, self_in_river, other_in_river):
-                return False
-
-            # 老鼠不能从水里吃岸上的棋子
-            if piece.rank == 1 and self_in_river and not other_in_river:
-                return False
-
-            # 岸上的棋子不能吃水里的老鼠
-            if piece.rank != 1 and not self_in_river and other_in_river:
-                return False
+            return CAPTURE_TABLE[capture_index(
+                piece.rank, target.rank, IS_RIVER_SQUARE[from_row * COLS + from_col], to_in_river, trap_status
+            )]
 
         return True
 
     def make_move(self, from_row, from_col, to_row, to_col):
+        """执行移动（原地修改局面）
+
+        Returns:
+            移动不合法时返回False；否则返回撤销记录
+            (起始行, 起始列, 目标行, 目标列, 被吃棋子, 移动前玩家, 移动前game_over, 移动前winner)，
+            记录同时压入撤销栈，可以用 unmake_move 恢复
+        """
         if self.game_over:
             return False
         
         if not self.is_valid_move(from_row, from_col, to_row, to_col, self.current_player):
             return False
         
-        piece = self.board[from_row][from_col]
-        self.board[to_row][to_col] = piece
-        self.board[from_row][from_col] = None
+        from_sq = from_row * COLS + from_col
+        to_sq = to_row * COLS + to_col
+        code = self.cells[from_sq]
+        undo = (from_row, from_col, to_row, to_col, PIECES[self.cells[to_sq]],
+                self.current_player, self.game_over, self.winner)
+        self._undo_stack.append(undo)
+
+        # 修改格子时会增量更新哈希值、棋子索引和棋子数量
+        self._set_code(to_sq, code)
+        self._set_code(from_sq, 0)
         
         # 检查是否吃掉对方兽穴
         opponent = 'blue' if self.current_player == 'red' else 'red'
         if self.is_den(to_row, to_col, opponent):
             self.game_over = True
             self.winner = self.current_player
-            return True
+            return undo
         
         # 检查是否吃掉对方所有棋子
-        opponent_pieces = 0
-        for row in range(9):
-            for col in range(7):
-                p = self.board[row][col]
-                if p and p.player == opponent:
-                    opponent_pieces += 1
-        
-        if opponent_pieces == 0:
+        if self.piece_count[opponent] == 0:
             self.game_over = True
             self.winner = self.current_player
-            return True
+            return undo
         
         # 切换玩家
         self.current_player = opponent
-        return True
+        return undo
+
+    def unmake_move(self, undo=None):
+        """撤销最近一次 make_move，恢复被吃的棋子、当前玩家和胜负状态
+
+        Args:
+            undo: make_move 返回的撤销记录；传入时必须是最近一次移动的记录
+
+        Returns:
+            被撤销的记录
+        """
+        if not self._undo_stack:
+            raise ValueError('没有可以撤销的移动')
+        if undo is not None and undo is not self._undo_stack[-1]:
+            raise ValueError('只能撤销最近一次移动')
+
+        record = self._undo_stack.pop()
+        from_row, from_col, to_row, to_col, captured, player, game_over, winner = record
+        to_sq = to_row * COLS + to_col
+        self._set_code(from_row * COLS + from_col, self.cells[to_sq])
+        self._set_code(to_sq, captured.code if captured else 0)
+        self.current_player = player
+        self.game_over = game_over
+        self.winner = winner
+        return record
 
     def get_valid_moves(self, player):
+        attacks = self._attacks
+        attacks.refresh(self)
+        targets = attacks.targets
         moves = []
-        for from_row in range(9):
-            for from_col in range(7):
-                piece = self.board[from_row][from_col]
-                if piece and piece.player == player:
-                    for to_row in range(9):
-                        for to_col in range(7):
-                            if self.is_valid_move(from_row, from_col, to_row, to_col, player):
-                                moves.append((from_row, from_col, to_row, to_col))
+        for piece, from_row, from_col in self.get_pieces(player):
+            for to_sq in targets[from_row * COLS + from_col][2]:
+                moves.append((from_row, from_col, to_sq // COLS, to_sq % COLS))
         return moves
 
+    def generate_moves(self, player):
+        """按阶段逐个生成合法移动（生成器）：先进入对方兽穴，再吃子（先吃等级高的），最后是普通移动
+
+        生成的移动与 get_valid_moves 相同，只是顺序不同；只需要前几个移动时不必生成完整列表
+        """
+        return self._attacks.staged_moves(self, player)
+
+    def has_any_legal_move(self, player):
+        """指定玩家是否还有合法移动，找到第一个就返回"""
+        for piece, from_row, from_col in self.get_pieces(player):
+            for to_row, to_col, river_squares in MOVE_TABLE[from_row * COLS + from_col]:
+                if self._check_move(piece, from_row, from_col, to_row, to_col, river_squares, player):
+                    return True
+        return False
+
+    def _legal_targets(self, sq):
+        """计算格子上棋子的合法目标格子，供 AttackMaps 使用"""
+        code = self.cells[sq]
+        if not code:
+            return None
+        piece = PIECES[code]
+        player = piece.player
+        from_row, from_col = divmod(sq, COLS)
+        return player, piece.rank, tuple(
+            to_row * COLS + to_col
+            for to_row, to_col, river_squares in MOVE_TABLE[sq]
+            if self._check_move(piece, from_row, from_col, to_row, to_col, river_squares, player)
+        )
+
+    def attackers(self, row, col, player):
+        """返回指定玩家能合法走到（或吃到）该格子的棋子
+
+        Returns:
+            {起点格子编号: 棋子等级}，调用者不应修改
+        """
+        self._attacks.refresh(self)
+        return self._attacks.attackers[player][row * COLS + col]
+
+    def legal_targets(self, row, col):
+        """返回该格子上棋子的合法目标格子编号（按行列顺序），空格返回空元组"""
+        self._attacks.refresh(self)
+        entry = self._attacks.targets.get(row * COLS + col)
+        return entry[2] if entry else ()
+
+    def mobility(self, player):
+        """指定玩家的合法移动数量，等于 len(get_valid_moves(player))"""
+        self._attacks.refresh(self)
+        return self._attacks.mobility[player]
+
+    def piece_at(self, row, col):
+        """返回指定位置的棋子（没有棋子时返回None）"""
+        return PIECES[self.cells[row * COLS + col]]
+
+    def get_pieces(self, player):
+        """返回指定玩家的所有棋子
+
+        Args:
+            player: 玩家（'red' 或 'blue'）
+
+        Returns:
+            [(棋子, 行, 列), ...]，按行列顺序排列；
+            结果在局面改变前会被缓存，调用者不应修改返回的列表
+        """
+        pieces = self._pieces_cache.get(player)
+        if pieces is None:
+            index = self._pieces[player]
+            pieces = [(index[sq], sq // COLS, sq % COLS) for sq in sorted(index)]
+            self._pieces_cache[player] = pieces
+        return pieces
+
     def get_board_state(self):
         state = []
+        cells = self.cells
         for row in range(9):
             row_state = []
             for col in range(7):
-                piece = self.board[row][col]
+                piece = PIECES[cells[row * COLS + col]]
                 if piece:
                     row_state.append({
                         'name': piece.name,
@@ -295,14 +888,119 @@ class DoushouqiGame:
             state.append(row_state)
         return state
 
+    def to_string(self):
+        """把局面编码成类似FEN的字符串
+
+        格式为 "棋盘 走棋方 胜者"：棋盘从第0行到第8行，行之间用 '/' 分隔，
+        棋子用 PIECE_LETTERS 中的字母表示（红方大写、蓝方小写），连续空格用数字表示；
+        走棋方为 'r' 或 'b'，胜者为 'r'、'b'，游戏未结束时为 '-'。
+        例如初始局面为 "e5l/ct3p1/w1r3d/7/7/7/D3R1W/1P3TC/L5E r -"
+        """
+        cells = self.cells
+        rows = []
+        for start in range(0, SQUARES, COLS):
+            text = ''
+            empty = 0
+            for code in cells[start:start + COLS]:
+                if code:
+                    if empty:
+                        text += str(empty)
+                        empty = 0
+                    text += CODE_LETTER[code]
+                else:
+                    empty += 1
+            if empty:
+                text += str(empty)
+            rows.append(text)
+        winner = PLAYER_LETTERS[self.winner] if self.game_over else '-'
+        return f"{'/'.join(rows)} {PLAYER_LETTERS[self.current_player]} {winner}"
+
+    @classmethod
+    def from_string(cls, text):
+        """从 to_string 的字符串还原局面
+
+        Raises:
+            ValueError: 字符串格式不正确
+        """
+        fields = text.split()
+        if len(fields) == 2:
+            fields.append('-')
+        if len(fields) != 3 or fields[1] not in ('r', 'b') or fields[2] not in LETTER_PLAYER:
+            raise ValueError(f'局面字符串格式不正确: {text!r}')
+        rows = fields[0].split('/')
+        if len(rows) != ROWS:
+            raise ValueError(f'局面字符串应有{ROWS}行: {text!r}')
+
+        cells = bytearray(SQUARES)
+        for row, row_text in enumerate(rows):
+            col = 0
+            for char in row_text:
+                if char.isdigit():
+                    col += int(char)
+                elif char in LETTER_CODE and col < COLS:
+                    cells[row * COLS + col] = LETTER_CODE[char]
+                    col += 1
+                else:
+                    raise ValueError(f'局面字符串第{row}行不正确: {row_text!r}')
+            if col != COLS:
+                raise ValueError(f'局面字符串第{row}行不正确: {row_text!r}')
+
+        winner = LETTER_PLAYER[fields[2]]
+        return cls._from_cells(cells, LETTER_PLAYER[fields[1]], winner is not None, winner)
+
+    def to_bytes(self):
+        """把局面编码成17个字节
+
+        第0字节：bit0为走棋方（1表示蓝方），bit1为游戏是否结束，bit2为胜者（1表示蓝方）；
+        之后16个字节依次是红方鼠~象、蓝方鼠~象所在的格子编号，已被吃掉为255
+
+        Raises:
+            ValueError: 棋盘上有重复的棋子，无法用这种格式表示
+        """
+        squares = bytearray(b'\xff' * 16)
+        for sq, code in enumerate(self.cells):
+            if code:
+                if squares[code - 1] != 255:
+                    raise ValueError('棋盘上有重复的棋子，无法编码')
+                squares[code - 1] = sq
+        flags = ((self.current_player == 'blue')
+                 | (self.game_over << 1)
+                 | ((self.winner == 'blue') << 2))
+        return bytes((flags,)) + bytes(squares)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """从 to_bytes 的结果还原局面
+
+        Raises:
+            ValueError: 数据长度或格子编号不正确
+        """
+        if len(data) != 17:
+            raise ValueError('局面数据应为17个字节')
+        cells = bytearray(SQUARES)
+        for code, sq in enumerate(data[1:], 1):
+            if sq != 255:
+                if sq >= SQUARES or cells[sq]:
+                    raise ValueError(f'局面数据中的格子编号不正确: {sq}')
+                cells[sq] = code
+        flags = data[0]
+        game_over = bool(flags & 2)
+        winner = ('blue' if flags & 4 else 'red') if game_over else None
+        return cls._from_cells(cells, 'blue' if flags & 1 else 'red', game_over, winner)
+
     def clone(self):
-        new_game = DoushouqiGame()
-        new_game.board = [[None for _ in range(7)] for _ in range(9)]
-        for row in range(9):
-            for col in range(7):
-                piece = self.board[row][col]
-                if piece:
-                    new_game.board[row][col] = Piece(piece.name, piece.rank, piece.player)
+        # 不经过 __init__，只复制会变化的状态；棋盘只需复制一个字节数组，棋子实例和地形表是共享的
+        new_game = self.__class__.__new__(self.__class__)
+        new_game.cells = self.cells[:]
+        new_game._board_view = None
+        new_game._attacks = AttackMaps()
+        new_game._pieces = {'red': self._pieces['red'].copy(), 'blue': self._pieces['blue'].copy()}
+        new_game.piece_count = self.piece_count.copy()
+        new_game._piece_key = self._piece_key
+        new_game.eval_table = self.eval_table
+        new_game.eval_totals = self.eval_totals.copy()
+        new_game._pieces_cache = {}
+        new_game._undo_stack = []
         new_game.current_player = self.current_player
         new_game.game_over = self.game_over
         new_game.winner = self.winner
@@ -0,0 +1,245 @@
+"""
+斗兽棋AI的开局库
+
+开局库文件把局面的Zobrist哈希值映射到若干个带权重的移动，离线用深度搜索生成，
+运行时通过 mmap 映射文件并二分查找，不需要把整个文件读入内存。
+
+文件格式（小端序）：
+    文件头16字节：魔数 b'DSQBOOK2'，条目数（uint32），保留（uint32）
+    之后是按 (键, 移动) 排序的条目，每个16字节：
+        键（uint64）：局面的 zobrist_key（包含走棋方）
+        移动（uint16）：起点格子 * 64 + 终点格子
+        权重（uint16）：选择这个移动的相对概率
+        分数（int32）：生成时以走棋方为视角的搜索分数
+
+用法：
+    python opening_book.py build                       # 生成 opening_book.bin（初始局面起2层，搜索深度4）
+    python opening_book.py build --plies 3 --depth 5   # 覆盖更多局面，搜索更深
+    python opening_book.py probe                       # 查询初始局面
+    python opening_book.py probe --fen "<局面字符串>"   # 查询指定局面（格式见 DoushouqiGame.to_string）
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+
+from game_logic import COLS, DoushouqiGame
+
+# DSQBOOK1 的分数来自把胜负判反的搜索，不再使用
+BOOK_MAGIC = b'DSQBOOK2'
+_HEADER = struct.Struct('<8sII')
+_ENTRY = struct.Struct('<QHHi')
+
+# 默认的开局库文件，与本模块放在同一目录
+DEFAULT_BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'opening_book.bin')
+
+# 生成时只收录分数与最佳移动相差不超过 BOOK_MARGIN 的移动，最多 BOOK_WIDTH 个
+BOOK_MARGIN = 50
+BOOK_WIDTH = 3
+
+
+def _encode_move(move):
+    from_row, from_col, to_row, to_col = move
+    return (from_row * COLS + from_col) * 64 + to_row * COLS + to_col
+
+
+def _decode_move(code):
+    from_sq, to_sq = divmod(code, 64)
+    return from_sq // COLS, from_sq % COLS, to_sq // COLS, to_sq % COLS
+
+
+class OpeningBook:
+    """只读的开局库，通过 mmap 访问文件
+
+    Args:
+        path: 开局库文件路径
+
+    Raises:
+        ValueError: 文件格式不正确
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as book_file:
+            size = os.fstat(book_file.fileno()).st_size
+            if size < _HEADER.size:
+                raise ValueError(f'开局库文件太短: {path}')
+            self._map = mmap.mmap(book_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count, _ = _HEADER.unpack_from(self._map, 0)
+        if magic != BOOK_MAGIC or size != _HEADER.size + count * _ENTRY.size:
+            self._map.close()
+            raise ValueError(f'开局库文件格式不正确: {path}')
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def _key_at(self, index):
+        return _ENTRY.unpack_from(self._map, _HEADER.size + index * _ENTRY.size)[0]
+
+    def probe(self, key):
+        """查找局面的所有开局库移动
+
+        Returns:
+            [(移动, 权重, 分数)]，不在开局库中时为空列表
+        """
+        # 二分查找第一个键不小于 key 的条目
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        moves = []
+        offset = _HEADER.size + low * _ENTRY.size
+        for _ in range(low, self.count):
+            entry_key, move, weight, score = _ENTRY.unpack_from(self._map, offset)
+            if entry_key != key:
+                break
+            moves.append((_decode_move(move), weight, score))
+            offset += _ENTRY.size
+        return moves
+
+    def close(self):
+        self._map.close()
+
+
+def write_book(path, entries):
+    """写入开局库文件
+
+    Args:
+        path: 文件路径，先写入临时文件再替换，写到一半中断不会破坏原有文件
+        entries: {键: [(移动, 权重, 分数)]}
+    """
+    rows = sorted(
+        (key, _encode_move(move), weight, score)
+        for key, moves in entries.items()
+        for move, weight, score in moves
+    )
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as book_file:
+        book_file.write(_HEADER.pack(BOOK_MAGIC, len(rows), 0))
+        for row in rows:
+            book_file.write(_ENTRY.pack(*row))
+    os.replace(temp_path, path)
+
+
+def score_root_moves(ai, game, depth):
+    """用AI的搜索给局面的每个合法移动打分（以走棋方为视角）
+
+    Returns:
+        [(分数, 移动)]，按分数从高到低排列
+    """
+    player = game.current_player
+    search_game = ai._start_search(game, player)
+    # 先做一次普通搜索，让换位表和移动排序表为逐个移动的搜索做好准备
+    ai._iterative_deepening_search(search_game, player, depth)
+    scored = []
+    for move in search_game.get_valid_moves(player):
+        search_game.make_move(*move)
+        score = -ai._negamax(search_game, depth - 1, -float('inf'), float('inf'), 1, player)
+        search_game.unmake_move()
+        scored.append((score, move))
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return scored
+
+
+def book_moves(scored, margin=BOOK_MARGIN, width=BOOK_WIDTH):
+    """从打过分的移动中选出开局库移动：与最佳移动相差不超过margin，分差越小权重越大"""
+    best_score = scored[0][0]
+    moves = []
+    for score, move in scored[:width]:
+        gap = best_score - score
+        if gap > margin:
+            break
+        moves.append((move, max(1, round(100 * (1 - gap / (margin + 1)))), int(round(score))))
+    return moves
+
+
+def build_book(path, plies=2, depth=4, difficulty='master', progress=None):
+    """从初始局面出发，对前 plies 层（包括双方的所有走法）的每个局面做深度搜索，生成开局库
+
+    Args:
+        path: 输出文件路径
+        plies: 覆盖的层数，初始局面为第0层
+        depth: 每个局面的搜索深度
+        difficulty: 使用哪个难度的评估函数
+        progress: 可选，每搜索完一个局面调用 progress(已完成, 已发现)
+
+    Returns:
+        收录的局面数
+    """
+    from ai_engine import DoushouqiAI
+
+    ai = DoushouqiAI(difficulty)
+    entries = {}
+    frontier = [DoushouqiGame()]
+    seen = {frontier[0].zobrist_key}
+    for ply in range(plies + 1):
+        next_frontier = []
+        for game in frontier:
+            scored = score_root_moves(ai, game, depth)
+            if scored:
+                entries[game.zobrist_key] = book_moves(scored)
+            if progress is not None:
+                progress(len(entries), len(seen))
+            if ply == plies:
+                continue
+            # 对手可能走任何一步，下一层包括所有合法移动后的局面
+            for move in game.get_valid_moves(game.current_player):
+                child = game.clone()
+                child.make_move(*move)
+                key = child.zobrist_key
+                if child.game_over or key in seen:
+                    continue
+                seen.add(key)
+                next_frontier.append(child)
+        frontier = next_frontier
+    write_book(path, entries)
+    return len(entries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='斗兽棋开局库')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build', help='生成开局库')
+    build_parser.add_argument('-o', '--output', default=DEFAULT_BOOK_PATH, help='输出文件，默认为 opening_book.bin')
+    build_parser.add_argument('--plies', type=int, default=2, help='覆盖的层数，默认2')
+    build_parser.add_argument('-d', '--depth', type=int, default=4, help='每个局面的搜索深度，默认4')
+    build_parser.add_argument('--difficulty', default='master', help='评估函数的难度，默认 master')
+    probe_parser = subparsers.add_parser('probe', help='查询局面')
+    probe_parser.add_argument('-b', '--book', default=DEFAULT_BOOK_PATH, help='开局库文件')
+    probe_parser.add_argument('--fen', help='局面字符串，默认为初始局面')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        start = time.perf_counter()
+
+        def progress(done, found):
+            print(f'\r已搜索 {done} / {found} 个局面', end='', flush=True)
+
+        count = build_book(args.output, args.plies, args.depth, args.difficulty, progress)
+        print(f'\n收录 {count} 个局面，用时 {time.perf_counter() - start:.1f}s，写入 {args.output}')
+        return 0
+
+    try:
+        game = DoushouqiGame.from_string(args.fen) if args.fen else DoushouqiGame()
+        book = OpeningBook(args.book)
+    except (ValueError, OSError) as error:
+        parser.error(str(error))
+    start = time.perf_counter()
+    moves = book.probe(game.zobrist_key)
+    elapsed = time.perf_counter() - start
+    for move, weight, score in sorted(moves, key=lambda entry: entry[1], reverse=True):
+        print(f'{move}: 权重 {weight}，分数 {score}')
+    print(f'{len(moves)} 个移动，开局库共 {len(book)} 个条目，查询用时 {elapsed * 1e6:.0f}us')
+    book.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
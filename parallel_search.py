@@ -0,0 +1,196 @@
+"""
+斗兽棋AI的多进程并行搜索（Lazy SMP）
+
+主进程和若干辅助进程同时对同一局面做迭代加深搜索，换位表放在共享内存
+（multiprocessing.shared_memory）中，所有进程共用。辅助进程的结果不直接使用，
+它们写入换位表的分数和最佳移动让主进程的搜索更快地剪枝。主进程搜索结束时通知
+辅助进程停止。
+
+换位表的条目是两个64位整数 (键 ^ 数据, 数据)，不加锁读写：
+写了一半的条目在读取时校验失败，当作未命中。
+
+用法（测量不同进程数下搜索到指定深度的时间）：
+    python parallel_search.py                          # 1、2、4个进程，大师级，深度5
+    python parallel_search.py --workers 1,2,4,8 -d 6   # 指定进程数和深度
+    python parallel_search.py --difficulty professional --positions 10
+"""
+
+import argparse
+import atexit
+import multiprocessing
+import random
+import sys
+import time
+from multiprocessing import shared_memory
+
+from game_logic import DoushouqiGame
+from transposition import TranspositionTable
+
+# 辅助进程中的状态，由 _init_worker 设置
+_worker_ai = None
+_worker_memory = None
+
+
+def _init_worker(difficulty, memory_name, stop_event):
+    """辅助进程的初始化：连接共享内存中的换位表，创建自己的AI实例"""
+    global _worker_ai, _worker_memory
+    from ai_engine import DoushouqiAI
+    _worker_memory = shared_memory.SharedMemory(name=memory_name)
+    _worker_ai = DoushouqiAI(difficulty, tt_buffer=_worker_memory.buf)
+    _worker_ai._stop_event = stop_event
+
+
+def _worker_search(position, player, max_depth, generation, start_depth):
+    """辅助进程中的一次搜索，直到搜索完 max_depth 或主进程通知停止
+
+    Returns:
+        搜索的节点数
+    """
+    ai = _worker_ai
+    game = ai._start_search(DoushouqiGame.from_bytes(position), player)
+    ai.transposition_table.generation = generation
+    ai._iterative_deepening_search(game, player, max_depth, start_depth=start_depth)
+    return ai.search_count
+
+
+class LazySMP:
+    """管理并行搜索的辅助进程和共享内存中的换位表
+
+    Args:
+        difficulty: AI难度，辅助进程使用相同的评估函数
+        workers: 总进程数（包括主进程），辅助进程数为 workers - 1
+        tt_size_mb: 换位表大小（MB）
+    """
+
+    def __init__(self, difficulty, workers, tt_size_mb=16):
+        self.difficulty = difficulty
+        self.workers = workers
+        self.memory = shared_memory.SharedMemory(create=True, size=TranspositionTable.bytes_for(tt_size_mb))
+        self.transposition_table = TranspositionTable(buffer=self.memory.buf)
+        self.stop_event = multiprocessing.Event()
+        self.pool = None  # 第一次搜索时创建
+        # 没有调用 close 时，在解释器退出前释放共享内存
+        atexit.register(self.close)
+
+    def start(self, game, player, max_depth, generation):
+        """让辅助进程开始搜索，返回它们的异步结果（交给 stop）"""
+        if self.pool is None:
+            self.pool = multiprocessing.Pool(
+                self.workers - 1, initializer=_init_worker,
+                initargs=(self.difficulty, self.memory.name, self.stop_event),
+            )
+        if not isinstance(game, DoushouqiGame):
+            position = DoushouqiGame()
+            position.board = game.board
+            position.current_player = game.current_player
+            game = position
+        position = game.to_bytes()
+        self.stop_event.clear()
+        # 一半的辅助进程从深度2开始，错开各进程正在搜索的深度
+        return [
+            self.pool.apply_async(_worker_search, (position, player, max_depth, generation, 1 + index % 2))
+            for index in range(1, self.workers)
+        ]
+
+    def stop(self, helpers):
+        """通知辅助进程停止并等待它们结束
+
+        Returns:
+            辅助进程的节点数之和
+        """
+        self.stop_event.set()
+        return sum(helper.get() for helper in helpers)
+
+    def close(self):
+        """结束辅助进程，释放共享内存（可以重复调用）"""
+        if self.memory is None:
+            return
+        atexit.unregister(self.close)
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+        self.transposition_table.words.release()
+        self.memory.close()
+        self.memory.unlink()
+        self.memory = None
+
+
+def benchmark_positions(count, seed=0):
+    """生成测量用的局面：初始局面和从初始局面随机走子得到的局面"""
+    rng = random.Random(seed)
+    positions = [DoushouqiGame()]
+    while len(positions) < count:
+        game = DoushouqiGame()
+        for _ in range(rng.randrange(4, 40)):
+            moves = game.get_valid_moves(game.current_player)
+            if game.game_over or not moves:
+                break
+            game.make_move(*rng.choice(moves))
+        if not game.game_over and game.has_any_legal_move(game.current_player):
+            positions.append(game)
+    return positions
+
+
+def speedup_curve(worker_counts, depth, difficulty='master', positions=None):
+    """测量不同进程数下搜索到指定深度的总时间
+
+    每个局面开始前清空换位表，进程池的创建不计入时间
+
+    Returns:
+        [(进程数, 总时间, 主进程节点数, 辅助进程节点数)]
+    """
+    from ai_engine import DoushouqiAI
+
+    if positions is None:
+        positions = benchmark_positions(6)
+    results = []
+    for workers in worker_counts:
+        ai = DoushouqiAI(difficulty, workers=workers)
+        try:
+            # 预热：创建进程池
+            ai.search(positions[0], positions[0].current_player, 1)
+            elapsed = 0.0
+            nodes = helper_nodes = 0
+            for game in positions:
+                ai.new_game()
+                start = time.perf_counter()
+                ai.search(game, game.current_player, depth)
+                elapsed += time.perf_counter() - start
+                nodes += ai.search_count
+                helper_nodes += ai.helper_count
+            results.append((workers, elapsed, nodes, helper_nodes))
+        finally:
+            ai.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='斗兽棋AI并行搜索的加速比测量')
+    parser.add_argument('--workers', default='1,2,4', help='逗号分隔的进程数，默认 1,2,4')
+    parser.add_argument('-d', '--depth', type=int, default=5, help='搜索深度，默认5')
+    parser.add_argument('--difficulty', default='master', help='AI难度，默认 master')
+    parser.add_argument('--positions', type=int, default=6, help='局面数，默认6')
+    parser.add_argument('--seed', type=int, default=0, help='随机局面的种子')
+    args = parser.parse_args(argv)
+
+    try:
+        worker_counts = [int(count) for count in args.workers.split(',')]
+    except ValueError:
+        parser.error(f'进程数格式不正确: {args.workers}')
+    if any(count < 1 for count in worker_counts):
+        parser.error('进程数至少为1')
+
+    positions = benchmark_positions(args.positions, args.seed)
+    print(f'{args.difficulty}，深度 {args.depth}，{len(positions)} 个局面，CPU核数 {multiprocessing.cpu_count()}')
+    print('进程数  总时间(s)  加速比  主进程节点  辅助进程节点')
+    base = None
+    for workers, elapsed, nodes, helper_nodes in speedup_curve(worker_counts, args.depth, args.difficulty, positions):
+        if base is None:
+            base = elapsed
+        print(f'{workers:>6}  {elapsed:>9.2f}  {base / elapsed:>6.2f}  {nodes:>10}  {helper_nodes:>12}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,431 @@
+"""
+斗兽棋走法生成器的perft测试工具
+
+perft统计从某个局面出发、走满指定层数后的叶子节点数，用来校验走法生成器是否正确。
+本模块还带有一个按原始规则逐条实现的参考走法生成器（不使用任何预计算表），
+可以在随机局面上与当前的走法生成器逐一对比。
+
+用法：
+    python perft.py                          # 用参考计数校验内置局面
+    python perft.py -d 4 --divide            # 初始局面4层，按根节点的每个移动分别输出
+    python perft.py --fen "<局面字符串>" -d 3 # 指定局面（格式见 DoushouqiGame.to_string）
+    python perft.py --backend bitboard -d 4  # 在位棋盘上运行
+    python perft.py --compare 500            # 在500个随机局面上对比各个走法生成器
+    python perft.py --captures               # 逐项对比吃子规则表与参考规则（不带参数运行时也会检查）
+    python perft.py --tactics                # 只检查AI搜索在一步取胜和必须防守的局面中的选择（不带参数运行时也会检查）
+"""
+
+import argparse
+import random
+import sys
+import time
+from collections import namedtuple
+
+from ai_engine import DoushouqiAI
+from bitboard import BitboardGame
+from game_logic import (
+    DoushouqiGame, SQUARES, IS_RIVER_SQUARE, SQUARE_TYPES, SQUARE_DEN,
+    CAPTURE_TABLE, capture_index, TRAP_NONE, TRAP_DEFENDER, TRAP_ATTACKER
+)
+
+# 参考规则使用的地形（与 game_logic 中的表分开定义，避免对比时共用同一份数据）
+_REF_RIVER = [
+    (3, 1), (3, 2), (4, 1), (4, 2), (5, 1), (5, 2),
+    (3, 4), (3, 5), (4, 4), (4, 5), (5, 4), (5, 5)
+]
+_REF_DENS = {'red': (8, 3), 'blue': (0, 3)}
+_REF_TRAPS = {
+    'red': [(8, 2), (8, 4), (7, 3)],
+    'blue': [(0, 2), (0, 4), (1, 3)]
+}
+
+
+def _ref_can_capture(piece, other, other_in_trap=False, self_in_river=False, other_in_river=False):
+    """原始的 Piece.can_capture 规则"""
+    if piece.player == other.player:
+        return False
+    if other_in_trap:
+        return True
+    if piece.rank == 1 and self_in_river and not other_in_river:
+        return False
+    if piece.rank == 1 and other.rank == 8 and self_in_river:
+        return False
+    if piece.rank == 1 and other.rank == 8 and not self_in_river:
+        return True
+    if piece.rank == 1 and other.rank == 1 and self_in_river and other_in_river:
+        return True
+    return piece.rank >= other.rank
+
+
+# 参考规则中的棋子只需要等级和玩家
+_RefPiece = namedtuple('_RefPiece', 'rank player')
+
+
+def reference_capture(rank, target_rank, self_in_river, other_in_river, trap_status):
+    """按 reference_is_valid_move 中的吃子规则判断一次相邻吃子是否合法（进攻方为红方）"""
+    if trap_status == TRAP_DEFENDER:
+        return False
+    piece = _RefPiece(rank, 'red')
+    target = _RefPiece(target_rank, 'blue')
+    if not _ref_can_capture(piece, target, trap_status == TRAP_ATTACKER, self_in_river, other_in_river):
+        return False
+    if rank == 1 and self_in_river and not other_in_river:
+        return False
+    if rank != 1 and not self_in_river and other_in_river:
+        return False
+    return True
+
+
+def compare_capture_table():
+    """逐项对比 game_logic.CAPTURE_TABLE 与参考吃子规则，覆盖所有等级、河流和陷阱状态的组合
+
+    Returns:
+        [(进攻方等级, 被吃方等级, 进攻方在河中, 被吃方在河中, 陷阱状态, 表中的值)]，全部一致时为空列表
+    """
+    mismatches = []
+    for rank in range(9):
+        for target_rank in range(9):
+            for self_in_river in (False, True):
+                for other_in_river in (False, True):
+                    for trap_status in (TRAP_NONE, TRAP_DEFENDER, TRAP_ATTACKER):
+                        actual = CAPTURE_TABLE[capture_index(
+                            rank, target_rank, self_in_river, other_in_river, trap_status
+                        )]
+                        # 等级0表示空格，不能吃也不能被吃
+                        expected = bool(rank and target_rank) and reference_capture(
+                            rank, target_rank, self_in_river, other_in_river, trap_status
+                        )
+                        if actual != expected:
+                            mismatches.append(
+                                (rank, target_rank, self_in_river, other_in_river, trap_status, actual)
+                            )
+    return mismatches
+
+
+def reference_is_valid_move(game, from_row, from_col, to_row, to_col, player):
+    """按原始规则逐条判断移动是否合法，只通过 game.piece_at 读取棋盘"""
+    piece = game.piece_at(from_row, from_col)
+    if not piece or piece.player != player:
+        return False
+
+    # 不能进入自己的兽穴
+    if (to_row, to_col) == _REF_DENS[player]:
+        return False
+
+    row_diff = abs(to_row - from_row)
+    col_diff = abs(to_col - from_col)
+
+    # 狮子和老虎纵向跳过3格河流，或横向跳过2格河流
+    if piece.rank in (6, 7) and ((row_diff == 4 and col_diff == 0) or (col_diff == 3 and row_diff == 0)):
+        step_row = (to_row > from_row) - (to_row < from_row)
+        step_col = (to_col > from_col) - (to_col < from_col)
+        span = max(row_diff, col_diff)
+        river_cells = [(from_row + step_row * i, from_col + step_col * i) for i in range(1, span)]
+        if all(cell in _REF_RIVER for cell in river_cells) and \
+                all(game.piece_at(r, c) is None for r, c in river_cells):
+            target = game.piece_at(to_row, to_col)
+            if target:
+                if target.player == player:
+                    return False
+                if not _ref_can_capture(piece, target):
+                    return False
+            return True
+
+    # 普通移动只能走一格
+    if row_diff + col_diff != 1:
+        return False
+
+    # 只有老鼠可以下河
+    if (to_row, to_col) in _REF_RIVER and piece.rank != 1:
+        return False
+
+    target = game.piece_at(to_row, to_col)
+    if target:
+        if target.player == player:
+            return False
+        opponent = 'blue' if target.player == 'red' else 'red'
+        target_in_my_trap = (to_row, to_col) in _REF_TRAPS[opponent]
+        # 在自己陷阱中的棋子不能被吃掉
+        if (to_row, to_col) in _REF_TRAPS[target.player]:
+            return False
+        self_in_river = (from_row, from_col) in _REF_RIVER
+        other_in_river = (to_row, to_col) in _REF_RIVER
+        if not _ref_can_capture(piece, target, target_in_my_trap, self_in_river, other_in_river):
+            return False
+        # 老鼠不能从水里吃岸上的棋子
+        if piece.rank == 1 and self_in_river and not other_in_river:
+            return False
+        # 岸上的棋子不能吃水里的老鼠
+        if piece.rank != 1 and not self_in_river and other_in_river:
+            return False
+
+    return True
+
+
+def reference_valid_moves(game, player):
+    """参考走法生成器：对每个己方棋子检查全部63个目标格子，顺序与 get_valid_moves 相同"""
+    moves = []
+    for from_row in range(9):
+        for from_col in range(7):
+            piece = game.piece_at(from_row, from_col)
+            if piece and piece.player == player:
+                for to_row in range(9):
+                    for to_col in range(7):
+                        if reference_is_valid_move(game, from_row, from_col, to_row, to_col, player):
+                            moves.append((from_row, from_col, to_row, to_col))
+    return moves
+
+
+def _current_valid_moves(game, player):
+    return game.get_valid_moves(player)
+
+
+def perft(game, depth, generate=_current_valid_moves):
+    """统计从当前局面走满depth层后的叶子节点数
+
+    游戏在中途结束（进入兽穴、吃光对方棋子）或无路可走的局面不计入。
+    局面会被原地走子/撤销，返回时保持不变
+
+    Args:
+        game: DoushouqiGame 或 BitboardGame
+        depth: 层数
+        generate: 走法生成函数 generate(game, player)，默认为 game.get_valid_moves
+    """
+    if depth == 0:
+        return 1
+    if game.game_over:
+        return 0
+    moves = generate(game, game.current_player)
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        if not game.make_move(*move):
+            raise AssertionError(f'生成了不合法的移动: {move}')
+        nodes += perft(game, depth - 1, generate)
+        game.unmake_move()
+    return nodes
+
+
+def divide(game, depth, generate=_current_valid_moves):
+    """按根节点的每个移动分别统计perft，返回 [(移动, 叶子节点数), ...]"""
+    results = []
+    for move in generate(game, game.current_player):
+        if not game.make_move(*move):
+            raise AssertionError(f'生成了不合法的移动: {move}')
+        results.append((move, perft(game, depth - 1, generate)))
+        game.unmake_move()
+    return results
+
+
+# 参考局面：(名称, 局面字符串, {层数: 叶子节点数})，计数由参考走法生成器得到
+REFERENCE_POSITIONS = [
+    ('初始局面', 'e5l/ct3p1/w1r3d/7/7/7/D3R1W/1P3TC/L5E r -',
+     {1: 19, 2: 361, 3: 6270, 4: 108866}),
+    # 河中双鼠相邻、红鼠挡住蓝狮跳河、红狮纵跳和红虎横跳、蓝虎横跳吃狗
+    ('河流与跳河', '7/7/1l2L2/t2D3/1Rr3T/3e2C/1E3w1/7/7 r -',
+     {1: 16, 2: 232, 3: 3505, 4: 48778}),
+    # 双方陷阱中都有棋子（在对方陷阱中可被任意棋子吃，在己方陷阱中不能被吃），兽穴旁一步即胜
+    ('陷阱与兽穴', '1cL1r2/3WD2/7/7/7/7/3E3/2C1p2/1Re1d2 b -',
+     {1: 12, 2: 181, 3: 1981, 4: 28493}),
+]
+
+
+# 一步取胜和必须防守的局面：(名称, 局面字符串, 唯一正确的移动)，检查搜索对胜负的判断
+TACTICS_POSITIONS = [
+    ('红狮进入兽穴', '7/3L3/7/7/7/7/7/7/e6 r -', (1, 3, 0, 3)),
+    ('蓝狮进入兽穴', 'E6/7/7/7/7/7/7/3l3/7 b -', (7, 3, 8, 3)),
+    ('吃掉最后一个棋子', '7/7/7/3c3/3E3/7/7/7/7 r -', (4, 3, 3, 3)),
+    # 蓝猫在红方兽穴旁的陷阱中，不吃掉它下一步就输
+    ('吃掉兽穴旁的猫', '7/7/7/7/7/7/7/6e/1Ec3R r -', (8, 1, 8, 2)),
+]
+TACTICS_DIFFICULTIES = ('amateur', 'professional', 'master')
+# 深度1时对手进入兽穴只在静态搜索中看到
+TACTICS_DEPTHS = (1, 2, 3)
+
+
+def check_tactics(positions=TACTICS_POSITIONS, difficulties=TACTICS_DIFFICULTIES, depths=TACTICS_DEPTHS):
+    """
+    在 positions 上按各个难度和深度运行AI搜索（不含随机移动）
+
+    Returns:
+        搜索结果与正确移动不同的列表，每项为 (名称, 难度, 深度, 搜索结果, 正确移动)
+    """
+    failures = []
+    for name, text, expected in positions:
+        game = DoushouqiGame.from_string(text)
+        for difficulty in difficulties:
+            for depth in depths:
+                move = DoushouqiAI(difficulty).search(game, game.current_player, depth)
+                if move != expected:
+                    failures.append((name, difficulty, depth, move, expected))
+    return failures
+
+
+def random_positions(count, seed=0, max_plies=80):
+    """生成用于对比的随机局面
+
+    一半由初始局面随机走子得到，一半把随机一部分棋子随机摆到它们可以站立的格子上，
+    后者更容易覆盖陷阱、河流中的老鼠和被挡住的跳河路线等少见情况
+    """
+    rng = random.Random(seed)
+    for index in range(count):
+        if index % 2 == 0:
+            game = DoushouqiGame()
+            for _ in range(rng.randrange(max_plies)):
+                moves = game.get_valid_moves(game.current_player)
+                if game.game_over or not moves:
+                    break
+                game.make_move(*rng.choice(moves))
+        else:
+            data = bytearray(b'\xff' * 17)
+            data[0] = rng.randrange(2)
+            free = list(range(SQUARES))
+            rng.shuffle(free)
+            for code in range(1, 17):
+                if rng.random() < 0.4:
+                    continue
+                rank = (code - 1) % 8 + 1
+                own_den = SQUARE_DEN['red' if code <= 8 else 'blue']
+                for sq in free:
+                    if SQUARE_TYPES[sq] != own_den and (rank == 1 or not IS_RIVER_SQUARE[sq]):
+                        free.remove(sq)
+                        data[code] = sq
+                        break
+            game = DoushouqiGame.from_bytes(bytes(data))
+        yield game
+
+
+def default_generators():
+    """待对比的走法生成器：(名称, generate(game, player), 是否要求与参考顺序相同)"""
+    return [
+        ('DoushouqiGame.get_valid_moves', _current_valid_moves, True),
+        ('DoushouqiGame.generate_moves', lambda game, player: list(game.generate_moves(player)), False),
+        ('BitboardGame.get_valid_moves',
+         lambda game, player: BitboardGame.from_game(game).get_valid_moves(player), True),
+    ]
+
+
+def compare_generators(count=200, seed=0, generators=None, reference=reference_valid_moves):
+    """在随机局面上对比各个走法生成器与参考走法生成器
+
+    Returns:
+        [(局面字符串, 玩家, 生成器名称, 缺少的移动, 多出的移动), ...]，全部一致时为空列表
+    """
+    if generators is None:
+        generators = default_generators()
+    disagreements = []
+    for game in random_positions(count, seed):
+        for player in ('red', 'blue'):
+            expected = reference(game, player)
+            for name, generate, ordered in generators:
+                moves = generate(game, player)
+                same = moves == expected if ordered else sorted(moves) == sorted(expected)
+                if not same:
+                    missing = sorted(set(expected) - set(moves))
+                    extra = sorted(set(moves) - set(expected))
+                    disagreements.append((game.to_string(), player, name, missing, extra))
+    return disagreements
+
+
+def _make_game(text, backend):
+    game = DoushouqiGame.from_string(text)
+    if backend == 'bitboard':
+        game = BitboardGame.from_game(game)
+    return game
+
+
+def _timed_perft(game, depth, generate):
+    start = time.perf_counter()
+    nodes = perft(game, depth, generate)
+    return nodes, time.perf_counter() - start
+
+
+def _format_move(move):
+    from_row, from_col, to_row, to_col = move
+    return f'({from_row},{from_col})->({to_row},{to_col})'
+
+
+def _check_capture_table():
+    """输出吃子规则表的对比结果，返回不一致的项数"""
+    mismatches = compare_capture_table()
+    for rank, target_rank, self_in_river, other_in_river, trap_status, actual in mismatches:
+        print(f'吃子规则表不一致：等级 {rank} 吃 {target_rank}，进攻方在河中 {self_in_river}，'
+              f'被吃方在河中 {other_in_river}，陷阱状态 {trap_status}，表中为 {actual}')
+    print(f'吃子规则表 {len(CAPTURE_TABLE)} 项，{len(mismatches)} 处不一致')
+    return len(mismatches)
+
+
+def _check_tactics():
+    """输出AI搜索在 TACTICS_POSITIONS 上的检查结果，返回走错的次数"""
+    failures = check_tactics()
+    for name, difficulty, depth, move, expected in failures:
+        found = _format_move(move) if move is not None else '无'
+        print(f'搜索走错：{name} {difficulty} 深度 {depth} 走 {found}，应为 {_format_move(expected)}')
+    total = len(TACTICS_POSITIONS) * len(TACTICS_DIFFICULTIES) * len(TACTICS_DEPTHS)
+    print(f'胜负局面搜索 {total} 次，{len(failures)} 次走错')
+    return len(failures)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='斗兽棋走法生成器perft测试')
+    parser.add_argument('-d', '--depth', type=int, help='搜索层数（不指定时校验内置参考局面）')
+    parser.add_argument('--fen', default=REFERENCE_POSITIONS[0][1], help='局面字符串，默认为初始局面')
+    parser.add_argument('--divide', action='store_true', help='按根节点的每个移动分别输出')
+    parser.add_argument('--backend', choices=('game', 'bitboard'), default='game', help='局面实现')
+    parser.add_argument('--reference', action='store_true', help='使用参考走法生成器（很慢）')
+    parser.add_argument('--compare', type=int, metavar='N', help='在N个随机局面上对比各个走法生成器')
+    parser.add_argument('--seed', type=int, default=0, help='随机局面的种子')
+    parser.add_argument('--captures', action='store_true', help='只对比吃子规则表与参考规则')
+    parser.add_argument('--tactics', action='store_true', help='只检查AI搜索在一步取胜和必须防守的局面中的选择')
+    args = parser.parse_args(argv)
+
+    generate = reference_valid_moves if args.reference else _current_valid_moves
+
+    if args.captures:
+        return 1 if _check_capture_table() else 0
+
+    if args.tactics:
+        return 1 if _check_tactics() else 0
+
+    if args.compare:
+        disagreements = compare_generators(args.compare, args.seed)
+        for text, player, name, missing, extra in disagreements:
+            print(f'不一致 [{name}] {player} "{text}"')
+            print(f'    缺少: {[_format_move(move) for move in missing]}')
+            print(f'    多出: {[_format_move(move) for move in extra]}')
+        print(f'{args.compare} 个随机局面，{len(disagreements)} 处不一致')
+        return 1 if disagreements else 0
+
+    if args.depth is not None:
+        try:
+            game = _make_game(args.fen, args.backend)
+        except ValueError as error:
+            parser.error(str(error))
+        start = time.perf_counter()
+        if args.divide:
+            results = divide(game, args.depth, generate)
+            for move, count in results:
+                print(f'{_format_move(move)}: {count}')
+            nodes = sum(count for move, count in results)
+            print(f'移动数: {len(results)}')
+        else:
+            nodes = perft(game, args.depth, generate)
+        elapsed = time.perf_counter() - start
+        print(f'perft({args.depth}) = {nodes}，用时 {elapsed:.3f}s，{nodes / max(elapsed, 1e-9):.0f} 节点/秒')
+        return 0
+
+    failed = _check_capture_table()
+    failed += _check_tactics()
+    for name, text, counts in REFERENCE_POSITIONS:
+        for depth, expected in sorted(counts.items()):
+            nodes, elapsed = _timed_perft(_make_game(text, args.backend), depth, generate)
+            status = 'OK' if nodes == expected else f'错误（应为 {expected}）'
+            failed += nodes != expected
+            print(f'{name} perft({depth}) = {nodes} {status}，'
+                  f'用时 {elapsed:.3f}s，{nodes / max(elapsed, 1e-9):.0f} 节点/秒')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
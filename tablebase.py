@@ -0,0 +1,564 @@
+"""
+斗兽棋残局库
+
+对双方棋子很少的局面（例如2对1、2对2），用逆向分析求出每个局面的准确结果：
+走棋方胜、负还是和（双方都无法取胜，可以一直走下去），以及双方都走最优时到对局结束的层数。
+搜索和 get_best_move 通过 mmap 按局面编号直接读取文件，不需要把文件读入内存。
+
+每种兵力组合一对文件，文件名为双方棋子的字母（见 PIECE_LETTERS，红方在前，等级从高到低），
+例如 LTvR 表示红方狮、虎对蓝方鼠：
+    LTvR.wdl  每个局面2位的结果：和、胜、负或非法局面（棋子重叠、站在河中或兽穴中）
+    LTvR.dtw  每个局面到对局结束的层数（胜方尽量快、负方尽量慢），和棋为0
+两个文件都以16字节的文件头开始：魔数、局面数、每个局面占的字节数（.wdl 为0，表示每字节4个局面）
+
+局面编号：红方棋子（等级从高到低）、蓝方棋子（等级从高到低）所在的格子依次作为63进制的各位，
+再乘以2加上走棋方（0为红方，1为蓝方）。
+棋盘旋转180度并交换双方颜色后规则不变，所以只保存红方兵力不少于蓝方的组合（见 _is_canonical），
+另一方向的局面查询时先旋转。
+
+用法：
+    python tablebase.py generate                  # 双方合计不超过3个棋子（2对1、1对1），单核约7分钟
+    python tablebase.py generate --pieces 4       # 再加上2对2，耗时很长，可以随时中断，重新运行时继续
+    python tablebase.py generate --workers 4      # 指定进程数，默认为CPU核数
+    python tablebase.py probe --fen "<局面字符串>"  # 查询局面（格式见 DoushouqiGame.to_string）
+"""
+
+import argparse
+import mmap
+import multiprocessing
+import os
+import struct
+import sys
+import time
+from array import array
+from itertools import combinations, product
+
+from game_logic import (
+    COLS, SQUARES, MOVE_TABLE, SQUARE_TYPES, SQUARE_RIVER, SQUARE_DEN, IS_RIVER_SQUARE, TRAP_OWNER,
+    CODE_PLAYER, CODE_RANK, PIECE_LETTERS, CAPTURE_TABLE, capture_index,
+    TRAP_NONE, TRAP_DEFENDER, TRAP_ATTACKER, DEN_POSITIONS, DoushouqiGame, piece_code
+)
+
+# 局面结果（以走棋方为视角）
+DRAW = 0
+WIN = 1
+LOSS = 2
+_INVALID = 3  # 非法局面，不会出现在对局中
+
+RESULT_NAMES = {DRAW: '和', WIN: '胜', LOSS: '负'}
+
+_WDL_MAGIC = b'DSQWDL01'
+_DTW_MAGIC = b'DSQDTW01'
+_HEADER = struct.Struct('<8sII')
+
+# 默认的残局库目录，与本模块放在同一目录
+DEFAULT_TABLEBASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tablebases')
+
+# 走棋方（0为红方，1为蓝方）要进入的对方兽穴
+_OPPONENT_DEN = tuple(
+    DEN_POSITIONS[opponent][0] * COLS + DEN_POSITIONS[opponent][1] for opponent in ('blue', 'red')
+)
+
+
+def _can_stand(code, sq):
+    """棋子能否停在该格子上（对局未结束的局面中）：不能在任何兽穴中，只有老鼠能在河中"""
+    square_type = SQUARE_TYPES[sq]
+    if square_type in (SQUARE_DEN['red'], SQUARE_DEN['blue']):
+        return False
+    return square_type != SQUARE_RIVER or CODE_RANK[code] == 1
+
+
+def _build_move_tables():
+    """每种棋子在每个格子上的候选移动 (目标格子, 跳河经过的河流格子)，以及反向的移动
+
+    只考虑与其他棋子无关的规则（不进自己的兽穴、只有老鼠下河、只有狮虎跳河），
+    其他棋子的阻挡和吃子在求解时检查
+    """
+    stand = [None] * 17
+    steps = [None] * 17
+    reverse = [None] * 17
+    for code in range(1, 17):
+        player = CODE_PLAYER[code]
+        rank = CODE_RANK[code]
+        stand[code] = tuple(_can_stand(code, sq) for sq in range(SQUARES))
+        code_steps = []
+        for sq in range(SQUARES):
+            targets = []
+            if stand[code][sq]:
+                for to_row, to_col, river_squares in MOVE_TABLE[sq]:
+                    to_sq = to_row * COLS + to_col
+                    if SQUARE_TYPES[to_sq] == SQUARE_DEN[player]:
+                        continue
+                    if river_squares is not None and rank not in (6, 7):
+                        continue
+                    if river_squares is None and IS_RIVER_SQUARE[to_sq] and rank != 1:
+                        continue
+                    targets.append((to_sq, river_squares))
+            code_steps.append(tuple(targets))
+        steps[code] = tuple(code_steps)
+        # reverse[code][目标格子] = ((起点格子, 河流格子), ...)：走到目标格子的不吃子移动
+        code_reverse = [[] for _ in range(SQUARES)]
+        for sq in range(SQUARES):
+            for to_sq, river_squares in code_steps[sq]:
+                if stand[code][to_sq]:
+                    code_reverse[to_sq].append((sq, river_squares))
+        reverse[code] = tuple(tuple(moves) for moves in code_reverse)
+    return stand, steps, reverse
+
+
+_STAND, _STEPS, _REVERSE = _build_move_tables()
+
+
+def _can_capture(code, from_sq, target_code, to_sq, river_squares):
+    """按 DoushouqiGame._check_move 的规则判断一次吃子是否合法"""
+    rank = CODE_RANK[code]
+    if river_squares is not None:
+        # 跳河的起点和落点都在岸上，落点不是陷阱
+        return CAPTURE_TABLE[capture_index(rank, CODE_RANK[target_code], False, False, TRAP_NONE)]
+    trap_owner = TRAP_OWNER[to_sq]
+    if trap_owner is None:
+        trap_status = TRAP_NONE
+    elif trap_owner == CODE_PLAYER[code]:
+        trap_status = TRAP_ATTACKER
+    else:
+        trap_status = TRAP_DEFENDER
+    return CAPTURE_TABLE[capture_index(
+        rank, CODE_RANK[target_code], IS_RIVER_SQUARE[from_sq], IS_RIVER_SQUARE[to_sq], trap_status
+    )]
+
+
+def _is_canonical(red, blue):
+    """兵力组合是否按规范方向保存：红方棋子数更多，或一样多时等级序列不小于蓝方"""
+    return (len(red), red) >= (len(blue), blue)
+
+
+def signature_name(red, blue):
+    """兵力组合的文件名（不含扩展名），例如 (7, 6), (1,) -> 'LTvR'"""
+    return ''.join(PIECE_LETTERS[rank] for rank in red) + 'v' + ''.join(PIECE_LETTERS[rank] for rank in blue)
+
+
+def signatures(pieces, max_side=2):
+    """双方合计不超过 pieces 个棋子、每方不超过 max_side 个棋子的所有兵力组合（规范方向）
+
+    按棋子总数从少到多排列：吃子后的局面属于棋子更少的组合，要先求解
+
+    Returns:
+        [(红方等级, 蓝方等级)]，等级从高到低
+    """
+    result = []
+    ranks = range(8, 0, -1)
+    for total in range(2, pieces + 1):
+        for red_count in range(max(1, total - max_side), min(max_side, total - 1) + 1):
+            for red in combinations(ranks, red_count):
+                for blue in combinations(ranks, total - red_count):
+                    if _is_canonical(red, blue):
+                        result.append((red, blue))
+    return result
+
+
+class _TableFile:
+    """一种兵力组合的两个文件，通过 mmap 读取"""
+
+    def __init__(self, path):
+        self.wdl = self._open(path + '.wdl', _WDL_MAGIC)
+        self.dtw = self._open(path + '.dtw', _DTW_MAGIC)
+        _, positions, _ = _HEADER.unpack_from(self.wdl, 0)
+        _, dtw_positions, width = _HEADER.unpack_from(self.dtw, 0)
+        if (dtw_positions != positions or width not in (1, 2)
+                or len(self.wdl) != _HEADER.size + (positions + 3) // 4
+                or len(self.dtw) != _HEADER.size + positions * width):
+            self.close()
+            raise ValueError(f'残局库文件大小不正确: {path}')
+        self.width = width
+
+    @staticmethod
+    def _open(path, magic):
+        with open(path, 'rb') as table_file:
+            if os.fstat(table_file.fileno()).st_size < _HEADER.size:
+                raise ValueError(f'残局库文件太短: {path}')
+            data = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if data[:len(magic)] != magic:
+            data.close()
+            raise ValueError(f'残局库文件格式不正确: {path}')
+        return data
+
+    def read(self, position):
+        """返回 (结果, 层数)，非法局面返回None"""
+        result = (self.wdl[_HEADER.size + (position >> 2)] >> ((position & 3) * 2)) & 3
+        if result == _INVALID:
+            return None
+        if self.width == 1:
+            return result, self.dtw[_HEADER.size + position]
+        offset = _HEADER.size + position * 2
+        return result, self.dtw[offset] | self.dtw[offset + 1] << 8
+
+    def close(self):
+        for data in (getattr(self, 'wdl', None), getattr(self, 'dtw', None)):
+            if data is not None:
+                data.close()
+
+
+class Tablebase:
+    """只读的残局库，第一次查询某种兵力组合时才打开对应的文件
+
+    Args:
+        directory: 残局库目录
+    """
+
+    def __init__(self, directory=DEFAULT_TABLEBASE_DIR):
+        self.directory = directory
+        names = set()
+        if os.path.isdir(directory):
+            files = set(os.listdir(directory))
+            names = {name[:-4] for name in files if name.endswith('.wdl') and name[:-4] + '.dtw' in files}
+        self.names = names
+        # 有文件的组合中最多的棋子数，棋子更多的局面直接返回None
+        self.max_pieces = max((len(name) - 1 for name in names), default=0)
+        self._tables = {}
+
+    def _table(self, red, blue):
+        name = signature_name(red, blue)
+        if name not in self._tables:
+            self._tables[name] = _TableFile(os.path.join(self.directory, name)) if name in self.names else None
+        return self._tables[name]
+
+    def probe_pieces(self, red, blue, side):
+        """查询局面
+
+        Args:
+            red, blue: 双方的棋子 [(等级, 格子编号)]，等级从高到低
+            side: 走棋方，0为红方，1为蓝方
+
+        Returns:
+            以走棋方为视角的 (结果, 层数)；没有对应的文件或局面非法时返回None
+        """
+        red_ranks = tuple(rank for rank, _ in red)
+        blue_ranks = tuple(rank for rank, _ in blue)
+        if not _is_canonical(red_ranks, blue_ranks):
+            # 旋转180度并交换颜色
+            red, blue = [(rank, SQUARES - 1 - sq) for rank, sq in blue], [(rank, SQUARES - 1 - sq) for rank, sq in red]
+            red_ranks, blue_ranks = blue_ranks, red_ranks
+            side = 1 - side
+        table = self._table(red_ranks, blue_ranks)
+        if table is None:
+            return None
+        number = 0
+        for _, sq in red:
+            number = number * SQUARES + sq
+        for _, sq in blue:
+            number = number * SQUARES + sq
+        return table.read(number * 2 + side)
+
+    def probe(self, game):
+        """查询对局中的局面（DoushouqiGame 或 BitboardGame）
+
+        Returns:
+            以走棋方为视角的 (结果, 层数)；棋子太多、没有对应的文件或对局已结束时返回None
+        """
+        if game.game_over or game.piece_count['red'] + game.piece_count['blue'] > self.max_pieces:
+            return None
+        red = sorted(((piece.rank, row * COLS + col) for piece, row, col in game.get_pieces('red')), reverse=True)
+        blue = sorted(((piece.rank, row * COLS + col) for piece, row, col in game.get_pieces('blue')), reverse=True)
+        return self.probe_pieces(red, blue, 0 if game.current_player == 'red' else 1)
+
+    def best_move(self, game):
+        """残局库中的最佳移动：保持局面的结果，胜局面尽快结束、负局面尽量拖延
+
+        Returns:
+            (移动, 结果, 层数)；局面不在残局库中或无路可走时返回None
+        """
+        entry = self.probe(game)
+        if entry is None:
+            return None
+        result, distance = entry
+        wanted = {WIN: (LOSS, distance - 1), LOSS: (WIN, distance - 1), DRAW: (DRAW, 0)}[result]
+        player = game.current_player
+        game = game.clone()
+        for move in game.get_valid_moves(player):
+            game.make_move(*move)
+            # 进入兽穴或吃光对方棋子：对手已经输了
+            child = (LOSS, 0) if game.game_over else self.probe(game)
+            game.unmake_move()
+            if child == wanted:
+                return move, result, distance
+        return None
+
+    def close(self):
+        for table in self._tables.values():
+            if table is not None:
+                table.close()
+        self._tables.clear()
+
+
+def solve(red, blue, tablebase):
+    """用逆向分析求解一种兵力组合的所有局面
+
+    先对每个局面生成一次移动：进入兽穴、吃掉最后一个棋子直接获胜，其他吃子查询棋子更少的组合，
+    不吃子的移动只计数。然后按层数从小到大确定结果：负局面的前一个局面是胜局面，
+    一个局面的所有移动都走到对手的胜局面时是负局面。最后仍未确定的局面是和棋
+
+    Args:
+        red, blue: 双方棋子的等级（从高到低）
+        tablebase: 用来查询吃子后局面的 Tablebase，棋子更少的组合必须已经生成
+
+    Returns:
+        (结果, 层数)：按局面编号排列的 bytearray 和 array('H')
+
+    Raises:
+        ValueError: 吃子后的局面所属的组合还没有生成
+    """
+    codes = [piece_code('red', rank) for rank in red] + [piece_code('blue', rank) for rank in blue]
+    count = len(codes)
+    sides = (range(len(red)), range(len(red), count))
+    # 每个棋子的格子在局面编号中的权重（已乘以2）
+    strides = [2 * SQUARES ** (count - 1 - i) for i in range(count)]
+    size = 2 * SQUARES ** count
+    stands = [_STAND[code] for code in codes]
+    steps = [_STEPS[code] for code in codes]
+    reverse = [_REVERSE[code] for code in codes]
+
+    results = bytearray(size)
+    distances = array('H', bytes(2 * size))
+    # 未确定的局面还有几个移动的结果不是对手胜；吃子后对手胜时，负局面的层数至少为 loss_floor
+    remaining = bytearray(size)
+    loss_floor = array('H', bytes(2 * size))
+    # 层数 -> 待确定的胜、负局面编号
+    wins = {}
+    losses = {}
+
+    # 1. 生成每个局面的移动
+    position = -2
+    for squares in product(range(SQUARES), repeat=count):
+        position += 2
+        if len(set(squares)) != count or not all(stands[i][sq] for i, sq in enumerate(squares)):
+            results[position] = results[position + 1] = _INVALID
+            continue
+        occupant = {sq: i for i, sq in enumerate(squares)}
+        for side in (0, 1):
+            movers = sides[side]
+            opponents = sides[1 - side]
+            opponent_den = _OPPONENT_DEN[side]
+            moves = quiet = best_win = floor = 0
+            drawn = False
+            for i in movers:
+                from_sq = squares[i]
+                for to_sq, river_squares in steps[i][from_sq]:
+                    if river_squares is not None and any(sq in occupant for sq in river_squares):
+                        continue
+                    j = occupant.get(to_sq)
+                    if j is None:
+                        moves += 1
+                        if to_sq == opponent_den:
+                            best_win = 1
+                        else:
+                            quiet += 1
+                        continue
+                    if j in movers or not _can_capture(codes[i], from_sq, codes[j], to_sq, river_squares):
+                        continue
+                    moves += 1
+                    if len(opponents) == 1:
+                        best_win = 1
+                        continue
+                    child_red = []
+                    child_blue = []
+                    for k in range(count):
+                        if k != j:
+                            pieces = child_red if k < len(red) else child_blue
+                            pieces.append((CODE_RANK[codes[k]], to_sq if k == i else squares[k]))
+                    child = tablebase.probe_pieces(child_red, child_blue, 1 - side)
+                    if child is None:
+                        raise ValueError(f'缺少残局库: {signature_name(*_ranks(child_red, child_blue))}')
+                    child_result, child_distance = child
+                    if child_result == LOSS:
+                        if not best_win or child_distance + 1 < best_win:
+                            best_win = child_distance + 1
+                    elif child_result == DRAW:
+                        drawn = True
+                    elif child_distance + 1 > floor:
+                        floor = child_distance + 1
+
+            index = position + side
+            if not moves:
+                # 无路可走，走棋方输
+                losses.setdefault(0, array('I')).append(index)
+                continue
+            # 吃子后不是对手胜时，这个局面不可能是负局面：多计一个永远不会减掉的移动
+            exits = quiet + (best_win > 0 or drawn)
+            if best_win:
+                wins.setdefault(best_win, array('I')).append(index)
+            if exits:
+                remaining[index] = exits
+                loss_floor[index] = floor
+            else:
+                losses.setdefault(floor, array('I')).append(index)
+
+    # 2. 按层数从小到大确定结果
+    distance = 0
+    while wins or losses:
+        for result, candidates in ((WIN, wins.pop(distance, ())), (LOSS, losses.pop(distance, ()))):
+            for index in candidates:
+                if results[index]:
+                    continue
+                results[index] = result
+                distances[index] = distance
+                # 前一个局面：上一步走棋的一方把某个棋子从空格子走到现在的格子
+                number = index >> 1
+                squares = [0] * count
+                for i in range(count - 1, -1, -1):
+                    number, squares[i] = divmod(number, SQUARES)
+                occupied = set(squares)
+                flipped = index ^ 1
+                for i in sides[1 - (index & 1)]:
+                    to_sq = squares[i]
+                    for from_sq, river_squares in reverse[i][to_sq]:
+                        if from_sq in occupied:
+                            continue
+                        if river_squares is not None and any(sq in occupied for sq in river_squares):
+                            continue
+                        parent = flipped + (from_sq - to_sq) * strides[i]
+                        if results[parent]:
+                            continue
+                        if result == LOSS:
+                            wins.setdefault(distance + 1, array('I')).append(parent)
+                        else:
+                            remaining[parent] -= 1
+                            if not remaining[parent]:
+                                losses.setdefault(max(distance + 1, loss_floor[parent]), array('I')).append(parent)
+        distance += 1
+
+    return results, distances
+
+
+def _ranks(red, blue):
+    return tuple(rank for rank, _ in red), tuple(rank for rank, _ in blue)
+
+
+def write_table(directory, red, blue, results, distances):
+    """写入一种兵力组合的文件，.wdl 最后写入，它存在就表示这个组合已经完整生成"""
+    path = os.path.join(directory, signature_name(red, blue))
+    positions = len(results)
+    # 每字节4个局面，每个2位
+    padded = results + bytes(-positions % 4)
+    packed = 0
+    for shift in range(4):
+        part = padded[shift::4].translate(bytes((value << (shift * 2)) & 0xFF for value in range(256)))
+        packed |= int.from_bytes(part, 'little')
+    wdl = packed.to_bytes(len(padded) // 4, 'little')
+    width = 1 if max(distances, default=0) < 256 else 2
+    if width == 1:
+        dtw = array('B', distances).tobytes()
+    else:
+        words = array('H', distances)
+        if sys.byteorder == 'big':
+            words.byteswap()
+        dtw = words.tobytes()
+
+    for extension, magic, item_size, data in (('.dtw', _DTW_MAGIC, width, dtw), ('.wdl', _WDL_MAGIC, 0, wdl)):
+        temp_path = path + extension + '.tmp'
+        with open(temp_path, 'wb') as table_file:
+            table_file.write(_HEADER.pack(magic, positions, item_size))
+            table_file.write(data)
+        os.replace(temp_path, path + extension)
+
+
+def _generate_task(task):
+    """生成一种兵力组合（在进程池中运行）
+
+    Returns:
+        (组合名, {结果: 局面数}, 用时)
+    """
+    directory, red, blue = task
+    start = time.perf_counter()
+    tablebase = Tablebase(directory)
+    try:
+        results, distances = solve(red, blue, tablebase)
+    finally:
+        tablebase.close()
+    write_table(directory, red, blue, results, distances)
+    counts = {result: results.count(result) for result in (WIN, DRAW, LOSS)}
+    return signature_name(red, blue), counts, time.perf_counter() - start
+
+
+def generate(directory=DEFAULT_TABLEBASE_DIR, pieces=3, max_side=2, workers=None, progress=None):
+    """生成残局库，已经生成的组合跳过，所以中断后重新运行会从未完成的组合继续
+
+    棋子数相同的组合互不依赖，在多个进程中并行求解；棋子数更多的组合要等更少的全部完成
+
+    Args:
+        directory: 输出目录
+        pieces: 双方合计的最多棋子数
+        max_side: 每方最多的棋子数
+        workers: 进程数，默认为CPU核数
+        progress: 可选，每完成一个组合调用 progress(组合名, {结果: 局面数}, 用时, 已完成, 总数)
+
+    Returns:
+        本次生成的组合数
+    """
+    os.makedirs(directory, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    todo = [
+        (red, blue) for red, blue in signatures(pieces, max_side)
+        if not os.path.exists(os.path.join(directory, signature_name(red, blue) + '.wdl'))
+    ]
+    pool = multiprocessing.Pool(workers) if workers > 1 and len(todo) > 1 else None
+    done = 0
+    try:
+        for total in sorted({len(red) + len(blue) for red, blue in todo}):
+            tasks = [(directory, red, blue) for red, blue in todo if len(red) + len(blue) == total]
+            finished = pool.imap_unordered(_generate_task, tasks) if pool else map(_generate_task, tasks)
+            for name, counts, elapsed in finished:
+                done += 1
+                if progress is not None:
+                    progress(name, counts, elapsed, done, len(todo))
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    return done
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='斗兽棋残局库')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    generate_parser = subparsers.add_parser('generate', help='生成残局库（可以中断，重新运行时继续）')
+    generate_parser.add_argument('-o', '--output', default=DEFAULT_TABLEBASE_DIR, help='输出目录，默认为 tablebases/')
+    generate_parser.add_argument('--pieces', type=int, default=3, help='双方合计的最多棋子数，默认3')
+    generate_parser.add_argument('--max-side', type=int, default=2, help='每方最多的棋子数，默认2')
+    generate_parser.add_argument('--workers', type=int, default=None, help='进程数，默认为CPU核数')
+    probe_parser = subparsers.add_parser('probe', help='查询局面')
+    probe_parser.add_argument('-d', '--directory', default=DEFAULT_TABLEBASE_DIR, help='残局库目录')
+    probe_parser.add_argument('--fen', required=True, help='局面字符串')
+    args = parser.parse_args(argv)
+
+    if args.command == 'generate':
+        if args.pieces < 2 or args.max_side < 1:
+            parser.error('至少需要双方各1个棋子')
+        start = time.perf_counter()
+
+        def progress(name, counts, elapsed, done, total):
+            summary = '，'.join(f'{RESULT_NAMES[result]} {counts[result]}' for result in (WIN, DRAW, LOSS))
+            print(f'[{done}/{total}] {name}：{summary}，用时 {elapsed:.1f}s', flush=True)
+
+        count = generate(args.output, args.pieces, args.max_side, args.workers, progress)
+        print(f'生成 {count} 个兵力组合，用时 {time.perf_counter() - start:.1f}s，写入 {args.output}')
+        return 0
+
+    try:
+        game = DoushouqiGame.from_string(args.fen)
+    except ValueError as error:
+        parser.error(str(error))
+    tablebase = Tablebase(args.directory)
+    try:
+        entry = tablebase.best_move(game)
+        if entry is None:
+            print('局面不在残局库中')
+            return 1
+        move, result, distance = entry
+        print(f'{RESULT_NAMES[result]}，{distance} 层，最佳移动 {move}')
+    finally:
+        tablebase.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
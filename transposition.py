@@ -0,0 +1,183 @@
+"""
+斗兽棋AI的换位表和评估缓存
+预先分配固定大小的内存，跨多次搜索保留
+"""
+
+from array import array
+
+from game_logic import COLS
+
+# 边界类型
+EXACT = 0  # 精确值
+LOWER = 1  # 下界（发生了beta剪枝）
+UPPER = 2  # 上界（没有移动超过alpha）
+
+# 条目数据的位布局（共56位）：
+#   0-12  最佳移动：起点格子 * 64 + 终点格子，第12位表示有移动
+#   13-14 边界类型
+#   15-21 深度
+#   22-29 搜索代数（用于淘汰旧条目）
+#   30-55 分数（四舍五入为整数，加上 SCORE_OFFSET 后存储）
+_MOVE_MASK = (1 << 13) - 1
+_HAS_MOVE = 1 << 12
+_FLAG_SHIFT = 13
+_DEPTH_SHIFT = 15
+_GENERATION_SHIFT = 22
+_SCORE_SHIFT = 30
+SCORE_OFFSET = 1 << 25
+MAX_DEPTH = (1 << 7) - 1
+
+# 每个桶两个条目：第一个优先保留深度大的，第二个总是被替换
+_WORDS_PER_BUCKET = 4
+_BUCKET_BYTES = _WORDS_PER_BUCKET * 8
+
+
+def encode_move(move):
+    """把移动 (起始行, 起始列, 目标行, 目标列) 编码成13位整数，None编码为0"""
+    if move is None:
+        return 0
+    from_row, from_col, to_row, to_col = move
+    return _HAS_MOVE | (from_row * COLS + from_col) << 6 | (to_row * COLS + to_col)
+
+
+def decode_move(code):
+    if not code & _HAS_MOVE:
+        return None
+    from_sq = (code >> 6) & 63
+    to_sq = code & 63
+    return from_sq // COLS, from_sq % COLS, to_sq // COLS, to_sq % COLS
+
+
+class TranspositionTable:
+    """固定大小的换位表
+
+    每个条目存为两个64位整数 (键 ^ 数据, 数据)，读取时用 键 ^ 数据 还原并校验键，
+    多个进程共享同一块内存时，写了一半的条目会因为校验失败而被当作未命中。
+
+    Args:
+        size_mb: 表的大小（MB）
+        buffer: 可选，使用已有的可写缓冲区（例如 multiprocessing.shared_memory 的 buf），
+                此时忽略 size_mb
+    """
+
+    def __init__(self, size_mb=16, buffer=None):
+        if buffer is None:
+            buckets = max(1, int(size_mb * 1024 * 1024) // _BUCKET_BYTES)
+            self.words = array('Q', bytes(buckets * _BUCKET_BYTES))
+        else:
+            buckets = len(buffer) // _BUCKET_BYTES
+            self.words = memoryview(buffer)[:buckets * _BUCKET_BYTES].cast('Q')
+        self.buckets = buckets
+        self.generation = 0
+
+    @staticmethod
+    def bytes_for(size_mb):
+        """size_mb 对应的缓冲区字节数（按整桶对齐），用于预先分配共享内存"""
+        return max(1, int(size_mb * 1024 * 1024) // _BUCKET_BYTES) * _BUCKET_BYTES
+
+    def new_search(self):
+        """开始新的一次搜索：搜索代数加一，之前搜索留下的条目在替换时优先被覆盖"""
+        self.generation = (self.generation + 1) & 0xFF
+
+    def clear(self):
+        """清空所有条目"""
+        zeros = array('Q', bytes(len(self.words) * 8))
+        self.words[:] = zeros
+        self.generation = 0
+
+    def probe(self, key):
+        """查找键为key的条目
+
+        Returns:
+            (分数, 深度, 边界类型, 最佳移动)，没有找到时返回None
+        """
+        words = self.words
+        index = (key % self.buckets) * _WORDS_PER_BUCKET
+        for slot in (index, index + 2):
+            data = words[slot + 1]
+            if words[slot] ^ data == key and data:
+                return (
+                    (data >> _SCORE_SHIFT) - SCORE_OFFSET,
+                    (data >> _DEPTH_SHIFT) & MAX_DEPTH,
+                    (data >> _FLAG_SHIFT) & 3,
+                    decode_move(data & _MOVE_MASK),
+                )
+        return None
+
+    def store(self, key, score, depth, flag, move):
+        """保存搜索结果
+
+        第一个条目只在深度不小于原有条目、原有条目来自更早的搜索或键相同时替换，
+        否则写入第二个条目（总是替换）
+        """
+        score = int(round(score))
+        score = min(max(score, -SCORE_OFFSET + 1), SCORE_OFFSET - 1)
+        data = (
+            encode_move(move)
+            | flag << _FLAG_SHIFT
+            | min(depth, MAX_DEPTH) << _DEPTH_SHIFT
+            | self.generation << _GENERATION_SHIFT
+            | (score + SCORE_OFFSET) << _SCORE_SHIFT
+        )
+        words = self.words
+        index = (key % self.buckets) * _WORDS_PER_BUCKET
+        old = words[index + 1]
+        if (not old
+                or words[index] ^ old == key
+                or (old >> _GENERATION_SHIFT) & 0xFF != self.generation
+                or depth >= (old >> _DEPTH_SHIFT) & MAX_DEPTH):
+            slot = index
+        else:
+            slot = index + 2
+        words[slot] = key ^ data
+        words[slot + 1] = data
+
+    def usage(self):
+        """估计当前搜索代数的条目所占的比例（千分比，抽样前1000个桶）"""
+        words = self.words
+        sample = min(self.buckets, 1000)
+        used = 0
+        for index in range(0, sample * _WORDS_PER_BUCKET, 2):
+            data = words[index + 1]
+            if data and (data >> _GENERATION_SHIFT) & 0xFF == self.generation:
+                used += 1
+        return used * 1000 // (sample * 2)
+
+
+class EvalCache:
+    """固定大小的评估缓存：局面键 -> 评估分数
+
+    与换位表分开保存，每个键只对应一个位置（直接映射），冲突时新的分数覆盖旧的。
+    hits / misses 记录命中和未命中的次数
+
+    Args:
+        size_mb: 缓存大小（MB），每个条目16字节
+    """
+
+    def __init__(self, size_mb=2):
+        entries = max(1, int(size_mb * 1024 * 1024) // 16)
+        self.keys = array('Q', bytes(entries * 8))
+        self.scores = array('d', bytes(entries * 8))
+        self.entries = entries
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """返回缓存的分数，没有时返回None"""
+        index = key % self.entries
+        if self.keys[index] == key:
+            self.hits += 1
+            return self.scores[index]
+        self.misses += 1
+        return None
+
+    def put(self, key, score):
+        index = key % self.entries
+        self.keys[index] = key
+        self.scores[index] = score
+
+    def clear(self):
+        """清空缓存和计数器"""
+        self.keys[:] = array('Q', bytes(self.entries * 8))
+        self.hits = 0
+        self.misses = 0